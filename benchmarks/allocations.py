@@ -0,0 +1,121 @@
+"""
+Count the memory blocks allocated by the mock when sending requests.
+
+Every request is sent through an actual httpx client, while tracemalloc traces allocations performed by pytest_httpx
+itself (dispatcher selection and request handling). Objects allocated for each request are retained during the
+measure so that they are all counted.
+
+Results are written as JSON (to stdout by default) so that they can be compared between revisions:
+
+    python -m benchmarks.allocations --output results.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from typing import List, Dict, Any
+
+import httpx
+
+import pytest_httpx
+from pytest_httpx import HTTPXMock, __version__
+from pytest_httpx import _httpx_mock
+
+
+def _trace_allocations(send, iterations: int) -> Dict[str, Any]:
+    retained = []
+    # Only allocations performed by pytest_httpx modules are relevant
+    package_filter = tracemalloc.Filter(
+        True, os.path.join(os.path.dirname(pytest_httpx.__file__), "*")
+    )
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot().filter_traces([package_filter])
+        for _ in range(iterations):
+            retained.append(send())
+        after = tracemalloc.take_snapshot().filter_traces([package_filter])
+    finally:
+        tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return {
+        "blocks_per_request": blocks / iterations,
+        "bytes_per_request": size / iterations,
+    }
+
+
+def _measure(mode: str, step: str, iterations: int) -> Dict[str, Any]:
+    mock = HTTPXMock()
+    mock.add_response()
+    url = httpx.URL("http://test_url")
+    _httpx_mock._active_mock = mock
+    patch = _httpx_mock._httpx_dispatchers_patch.__wrapped__()
+    next(patch)
+    try:
+        if mode == "sync":
+            client = httpx.Client()
+            if step == "dispatcher":
+                send = lambda: client.dispatcher_for_url(url)
+            else:
+                send = lambda: client.get(url)
+            result = _trace_allocations(send, iterations)
+        else:
+            client = httpx.AsyncClient()
+            loop = asyncio.new_event_loop()
+            if step == "dispatcher":
+                send = lambda: client.dispatcher_for_url(url)
+            else:
+                send = lambda: loop.run_until_complete(client.get(url))
+            try:
+                result = _trace_allocations(send, iterations)
+            finally:
+                loop.close()
+    finally:
+        next(patch, None)
+        _httpx_mock._active_mock = None
+
+    result.update({"mode": mode, "step": step, "iterations": iterations})
+    return result
+
+
+def main(arguments: List[str] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--iterations", type=int, default=1_000, help="Requests sent per measure."
+    )
+    parser.add_argument(
+        "--output", help="File to write JSON results to (default to stdout)."
+    )
+    options = parser.parse_args(arguments)
+
+    results = [
+        _measure(mode, step, options.iterations)
+        for mode in ("sync", "async")
+        for step in ("dispatcher", "request")
+    ]
+    report = {
+        "date": datetime.datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "httpx": httpx.__version__,
+        "pytest_httpx": __version__,
+        "results": results,
+    }
+
+    if options.output:
+        with open(options.output, "w") as output:
+            json.dump(report, output, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+    return results
+
+
+if __name__ == "__main__":
+    main()
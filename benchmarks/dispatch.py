@@ -0,0 +1,221 @@
+"""
+Measure the cost of a round-trip through the mock dispatchers.
+
+Every scenario registers responses (or callbacks) on a fresh HTTPXMock, then sends the same request
+(matching the last registration) a number of times through _PytestSyncDispatcher or _PytestAsyncDispatcher.
+
+Results are written as JSON (to stdout by default) so that they can be compared between revisions:
+
+    python -m benchmarks.dispatch --output results.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+from typing import List, Dict, Any, Callable
+
+import httpx
+
+from pytest_httpx import HTTPXMock, __version__
+from pytest_httpx._httpx_mock import _PytestSyncDispatcher, _PytestAsyncDispatcher
+
+MATCHERS = ("exact", "regex", "headers", "content", "callback")
+REGISTRY_SIZES = (1, 10, 100, 1_000)
+BODY_SIZES = (0, 1_024, 1_024 * 1_024)
+JOURNAL_SIZES = (0, 10_000, 100_000)
+
+
+def _register(mock: HTTPXMock, matcher: str, index: int, body: bytes):
+    url = f"http://test_url/{index}"
+    if matcher == "exact":
+        mock.add_response(url=url, data=body)
+    elif matcher == "regex":
+        mock.add_response(url=re.compile(re.escape(url) + "$"), data=body)
+    elif matcher == "headers":
+        mock.add_response(url=url, match_headers={"X-Index": str(index)}, data=body)
+    elif matcher == "content":
+        mock.add_response(url=url, match_content=str(index).encode(), data=body)
+    elif matcher == "callback":
+        mock.add_callback(
+            lambda request, timeout: httpx.Response(200, content=body, request=request),
+            url=url,
+        )
+    else:
+        raise ValueError(f"{matcher} is not a valid matcher kind.")
+
+
+def _request(index: int) -> httpx.Request:
+    return httpx.Request(
+        "GET",
+        f"http://test_url/{index}",
+        headers={"X-Index": str(index)},
+        data=str(index).encode(),
+    )
+
+
+def _scenario(
+    matcher: str, registry_size: int, body_size: int, journal_size: int
+) -> Dict[str, Any]:
+    mock = HTTPXMock()
+    body = b"x" * body_size
+    for index in range(registry_size):
+        _register(mock, matcher, index, body)
+
+    # Fill the request journal
+    journal_request = httpx.Request("GET", "http://journal_url")
+    mock.add_response(url="http://journal_url")
+    for _ in range(journal_size):
+        mock._handle_request(journal_request)
+
+    return {"mock": mock, "request": _request(registry_size - 1)}
+
+
+def _measure_sync(scenario: Dict[str, Any], iterations: int) -> float:
+    dispatcher = _PytestSyncDispatcher(scenario["mock"])
+    request = scenario["request"]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        response = dispatcher.send(request, timeout=None)
+        response.read()
+    return time.perf_counter() - start
+
+
+def _measure_async(scenario: Dict[str, Any], iterations: int) -> float:
+    dispatcher = _PytestAsyncDispatcher(scenario["mock"])
+    request = scenario["request"]
+
+    async def send_all() -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            response = await dispatcher.send(request, timeout=None)
+            await response.aread()
+        return time.perf_counter() - start
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(send_all())
+    finally:
+        loop.close()
+
+
+def _run(
+    mode: str,
+    matcher: str,
+    registry_size: int,
+    body_size: int,
+    journal_size: int,
+    iterations: int,
+    repeat: int,
+) -> Dict[str, Any]:
+    measure: Callable = _measure_sync if mode == "sync" else _measure_async
+    timings = []
+    for _ in range(repeat):
+        scenario = _scenario(matcher, registry_size, body_size, journal_size)
+        # Warm up (first call selection, lazy compilation)
+        measure(scenario, 1)
+        timings.append(measure(scenario, iterations) / iterations)
+
+    return {
+        "mode": mode,
+        "matcher": matcher,
+        "registry_size": registry_size,
+        "body_size": body_size,
+        "journal_size": journal_size,
+        "iterations": iterations,
+        "repeat": repeat,
+        "min_seconds_per_request": min(timings),
+        "median_seconds_per_request": statistics.median(timings),
+        "requests_per_second": 1 / min(timings),
+    }
+
+
+def _scenarios(quick: bool) -> List[Dict[str, int]]:
+    registry_sizes = REGISTRY_SIZES[:3] if quick else REGISTRY_SIZES
+    body_sizes = BODY_SIZES[:2] if quick else BODY_SIZES
+    journal_sizes = JOURNAL_SIZES[:2] if quick else JOURNAL_SIZES
+    scenarios = []
+    # Growth with the number of registrations, per matcher kind
+    for matcher in MATCHERS:
+        for registry_size in registry_sizes:
+            scenarios.append(
+                dict(
+                    matcher=matcher,
+                    registry_size=registry_size,
+                    body_size=0,
+                    journal_size=0,
+                )
+            )
+    # Growth with the size of the response body
+    for body_size in body_sizes[1:]:
+        scenarios.append(
+            dict(matcher="exact", registry_size=1, body_size=body_size, journal_size=0)
+        )
+    # Growth with the number of already sent requests
+    for journal_size in journal_sizes[1:]:
+        scenarios.append(
+            dict(
+                matcher="exact", registry_size=1, body_size=0, journal_size=journal_size
+            )
+        )
+    return scenarios
+
+
+def main(arguments: List[str] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--iterations", type=int, default=1_000, help="Requests sent per measure."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Measures performed per scenario."
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("sync", "async", "both"),
+        default="both",
+        help="Dispatcher(s) to measure.",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Only run smaller scenarios."
+    )
+    parser.add_argument(
+        "--output", help="File to write JSON results to (default to stdout)."
+    )
+    options = parser.parse_args(arguments)
+
+    modes = ("sync", "async") if options.mode == "both" else (options.mode,)
+    results = [
+        _run(
+            mode,
+            iterations=options.iterations,
+            repeat=options.repeat,
+            **scenario,
+        )
+        for scenario in _scenarios(options.quick)
+        for mode in modes
+    ]
+    report = {
+        "date": datetime.datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "httpx": httpx.__version__,
+        "pytest_httpx": __version__,
+        "results": results,
+    }
+
+    if options.output:
+        with open(options.output, "w") as output:
+            json.dump(report, output, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,10 @@
 from pytest_httpx.version import __version__
-from pytest_httpx._httpx_mock import httpx_mock, HTTPXMock
+from pytest_httpx._httpx_mock import httpx_mock, HTTPXMock, _httpx_dispatchers_patch
+from pytest_httpx._load import httpx_load, LoadHarness, LoadReport
+from pytest_httpx._stats import (
+    pytest_addoption,
+    pytest_configure,
+    pytest_sessionfinish,
+    pytest_testnodedown,
+    pytest_terminal_summary,
+)
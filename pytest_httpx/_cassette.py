@@ -0,0 +1,93 @@
+import json
+import mmap
+import os
+import threading
+from typing import List, Tuple, Union, Any
+
+from httpx import Request, Response, content_streams
+
+# A cassette file is made of:
+#  * Every response body, one after the other.
+#  * An index, with one JSON array per line (one line per exchange):
+#    [method, url, status_code, http_version, headers, body_offset, body_length]
+#  * A trailer line, a JSON object providing the format version and the offset of the index.
+CASSETTE_VERSION = 1
+
+
+class CassetteRecorder:
+    """
+    Exchanges forwarded to actual servers, written to a cassette file once recording is over.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self.path = path
+        self._exchanges: List[Tuple[Request, Response, bytes]] = []
+        # Requests may be forwarded by several threads
+        self._lock = threading.Lock()
+
+    def record(self, request: Request, response: Response, body: bytes) -> Response:
+        """
+        Record an exchange and return a response (with the already received raw body) to send back.
+        """
+        with self._lock:
+            self._exchanges.append((request, response, body))
+
+        return Response(
+            status_code=response.status_code,
+            http_version=response.http_version,
+            headers=response.headers.raw,
+            stream=content_streams.ByteStream(body),
+            request=request,
+        )
+
+    def save(self):
+        with self._lock, open(self.path, "wb") as cassette:
+            index = []
+            for request, response, body in self._exchanges:
+                index.append(
+                    json.dumps(
+                        [
+                            request.method,
+                            str(request.url),
+                            response.status_code,
+                            response.http_version,
+                            # Header names and values are bytes, latin-1 decoding maps every byte value
+                            [
+                                [name.decode("latin-1"), value.decode("latin-1")]
+                                for name, value in response.headers.raw
+                            ],
+                            cassette.tell(),
+                            len(body),
+                        ],
+                        separators=(",", ":"),
+                    )
+                )
+                cassette.write(body)
+
+            index_offset = cassette.tell()
+            for line in index:
+                cassette.write(line.encode("utf-8") + b"\n")
+            trailer = {"version": CASSETTE_VERSION, "index_offset": index_offset}
+            cassette.write(json.dumps(trailer).encode("utf-8") + b"\n")
+
+
+def parse_cassette(
+    path: Union[str, os.PathLike], content: Union[mmap.mmap, bytes]
+) -> List[List[Any]]:
+    """
+    Parse the index of a cassette file.
+
+    :param path: Path to the cassette file (only used in error message).
+    :param content: Content of the cassette file (usually memory-mapped).
+    :return: The exchanges: [method, url, status_code, http_version, headers, body_offset, body_length]
+    """
+    try:
+        trailer_start = content.rfind(b"\n", 0, len(content) - 1) + 1
+        trailer = json.loads(content[trailer_start:])
+        if trailer.get("version") != CASSETTE_VERSION:
+            raise ValueError
+        index = content[trailer["index_offset"] : trailer_start]
+        # JSON strings cannot contain a new line, the whole index can be parsed at once as a single JSON array
+        return json.loads(b"[" + index.rstrip(b"\n").replace(b"\n", b",") + b"]")
+    except (ValueError, AttributeError, KeyError, TypeError):
+        raise ValueError(f"{path} is not a valid cassette file.")
@@ -1,76 +1,1167 @@
+import asyncio
+import collections
+import functools
+import heapq
+import inspect
+import itertools
+import json
+import mmap
+import operator
+import os
 import re
-from typing import List, Union, Optional, Callable, Tuple, Pattern, Any
+import sys
+import threading
+import time
+import urllib.parse
+from typing import (
+    List,
+    Union,
+    Optional,
+    Callable,
+    Tuple,
+    Pattern,
+    Any,
+    Dict,
+    Deque,
+    Iterable,
+)
 
 import httpx
 import pytest
 from httpx import Request, Response, URL, content_streams
+from httpx.status_codes import StatusCode
+
 from httpx.dispatch.base import SyncDispatcher, AsyncDispatcher
+from httpx.dispatch.connection_pool import ConnectionPool
+from httpx.dispatch.urllib3 import URLLib3Dispatcher
+
+from pytest_httpx._cassette import CassetteRecorder, parse_cassette
+from pytest_httpx._routes import load_routes
+from pytest_httpx._server import MockServer
+from pytest_httpx._shared import SharedFile, SharedFiles
+from pytest_httpx._stats import (
+    RegistrationStatistics,
+    SessionStatistics,
+    session_statistics,
+)
+
+# re.Pattern was introduced in Python 3.7
+_Pattern = re._pattern_type if hasattr(re, "_pattern_type") else re.Pattern
+
+
+def _match_any_url(url: str) -> bool:
+    return True
+
+
+# Character allowed as is in a path segment or a query string, once normalized by httpx.URL
+_URL_CHARACTER = r"[\w\-.~!$&'()*+,;=:@]|%[0-9A-F]{2}"
+
+# URL that httpx.URL would leave untouched: lower cased scheme and host, no dot segment, nothing to percent-encode
+_NORMALIZED_URL = re.compile(
+    rf"[a-z][a-z0-9+\-.]*://[a-z0-9\-._]+(?::[0-9]+)?"
+    rf"(?:/(?!\.\.?(?:[/?]|$))(?:{_URL_CHARACTER})*)*"
+    rf"(?:\?(?:{_URL_CHARACTER}|[/?])*)?",
+    re.ASCII,
+)
+
+
+def _normalize_url(url: str) -> str:
+    # Parsing is by far the most expensive part of a registration, most URLs are already normalized
+    if _NORMALIZED_URL.fullmatch(url):
+        return url
+    return _parse_url(url)
+
+
+@functools.lru_cache(maxsize=16_384)
+def _parse_url(url: str) -> str:
+    # Route tables usually register the same URLs (for several methods, in every test)
+    return str(URL(url))
+
+
+def _without_query(url: str) -> str:
+    return url.partition("#")[0].partition("?")[0]
+
+
+def _canonical_query(query: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    Query parameters (name and value) of this query string, that are the same whatever the parameters order.
+    """
+    return tuple(sorted(urllib.parse.parse_qsl(query, keep_blank_values=True)))
+
+
+def _split_url(url: str) -> Tuple[str, List[str], str]:
+    """
+    Return origin (scheme, host and port), path segments and query string of a normalized URL.
+    """
+    url, _, query = url.partition("#")[0].partition("?")
+    path_start = url.find("/", url.find("://") + 3)
+    if path_start == -1:
+        return url, [""], query
+    return url[:path_start], url[path_start + 1 :].split("/"), query
+
+
+_TEMPLATE_PARAMETER = re.compile(r"{(\w+)}")
+
+
+class _URLTemplate:
+    """
+    URL where some path segments are parameters, such as https://test_url/users/{user_id}.
+
+    Static path segments are compared to the (percent-encoded) path segments of the request URL.
+    """
+
+    def __init__(self, template: str, ignore_query: bool = False):
+        self.template = template
+        scheme, netloc, path, query, _ = urllib.parse.urlsplit(template)
+        if not scheme or not netloc:
+            raise ValueError(f"{template} is not a valid URL template.")
+
+        # Query string is not matched (None) if query parameters are matched on their own
+        self.query: Optional[str] = None if ignore_query else query
+
+        self.origin = _normalize_url(f"{scheme}://{netloc}")
+        # Parameter name (None for a static segment) and static value of every path segment
+        self.segments: List[Tuple[Optional[str], str]] = []
+        for segment in path[1:].split("/"):
+            parameter = _TEMPLATE_PARAMETER.fullmatch(segment)
+            if parameter:
+                if parameter.group(1) in self.parameters:
+                    raise ValueError(
+                        f"{template} is not a valid URL template, {parameter.group(1)} parameter is provided more than once."
+                    )
+                self.segments.append((parameter.group(1), segment))
+            elif "{" in segment or "}" in segment:
+                raise ValueError(
+                    f"{template} is not a valid URL template, parameters must be full path segments such as {{name}}."
+                )
+            else:
+                self.segments.append((None, segment))
+
+    @property
+    def parameters(self) -> List[str]:
+        return [name for name, _ in self.segments if name]
+
+    def params(self, url: str) -> Optional[Dict[str, str]]:
+        """
+        Return the (percent-decoded) value of every parameter, None if URL does not match this template.
+        """
+        origin, segments, query = _split_url(url)
+        if (
+            origin != self.origin
+            or (self.query is not None and query != self.query)
+            or len(segments) != len(self.segments)
+        ):
+            return None
+
+        params = {}
+        for (name, expected), segment in zip(self.segments, segments):
+            if name:
+                if not segment:
+                    return None
+                params[name] = urllib.parse.unquote(segment)
+            elif segment != expected:
+                return None
+        return params
+
+
+def _whole_number(value: float) -> Union[int, float]:
+    # Equal JSON numbers (such as 1 and 1.0) must lead to the same JSON text
+    return int(value) if value.is_integer() else value
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, float):
+        return _whole_number(value)
+    if isinstance(value, dict):
+        return {key: _canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(item) for item in value]
+    return value
+
+
+def _canonical_json(value: Any) -> str:
+    """
+    JSON text of this value, that is the same for every equivalent JSON (whatever the key order, spacing or
+    number representation).
+    """
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+class _RequestContext:
+    """
+    Values of a received request, computed once and shared by every matcher.
+    """
+
+    def __init__(self, request: Request):
+        self.request = request
+        self.method = request.method
+        self.url = str(request.url)
+        self._headers: Optional[Dict[str, List[str]]] = None
+        self._content: Optional[bytes] = None
+        self._json_key: Optional[Tuple[Optional[str]]] = None
+        self._base_url: Optional[str] = None
+        self._query_key: Optional[Tuple[Tuple[str, str], ...]] = None
+
+    @property
+    def base_url(self) -> str:
+        """
+        URL without query string.
+        """
+        if self._base_url is None:
+            self._base_url = _without_query(self.url)
+        return self._base_url
+
+    @property
+    def query_key(self) -> Tuple[Tuple[str, str], ...]:
+        """
+        Query parameters of the URL, whatever their order.
+        """
+        if self._query_key is None:
+            self._query_key = _canonical_query(self.request.url.query)
+        return self._query_key
+
+    @property
+    def headers(self) -> Dict[str, List[str]]:
+        """
+        Lower cased header name associated to every value (in order of reception).
+        """
+        if self._headers is None:
+            self._headers = {}
+            for header_name, header_value in self.request.headers.items():
+                self._headers.setdefault(header_name, []).append(header_value)
+        return self._headers
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = self.request.read()
+        return self._content
+
+    @property
+    def json_key(self) -> Optional[str]:
+        """
+        Canonical JSON text of the body, None if body is not valid JSON.
+        """
+        if self._json_key is None:
+            try:
+                self._json_key = (
+                    _canonical_json(
+                        json.loads(
+                            self.content,
+                            parse_float=lambda text: _whole_number(float(text)),
+                        )
+                    ),
+                )
+            except ValueError:
+                self._json_key = (None,)
+        return self._json_key[0]
+
+
+def _shorten(value: Any, max_length: int = 100) -> str:
+    text = repr(value)
+    return text if len(text) <= max_length else f"{text[:max_length - 3]}..."
+
+
+def _header_present(values: Optional[List[str]]) -> bool:
+    return values is not None
+
+
+def _header_absent(values: Optional[List[str]]) -> bool:
+    return values is None
+
+
+def _compile_header_match(
+    expected: Union[str, List[str], Pattern, bool, None],
+) -> Callable[[Optional[List[str]]], bool]:
+    """
+    Return a function evaluating the values received for a header (None if header was not received).
+    """
+    if expected is True:
+        return _header_present
+
+    # None was matching absent headers before other values were handled
+    if expected is False or expected is None:
+        return _header_absent
+
+    # Repeated headers are compared as a single comma separated value, unless every value is expected
+    if isinstance(expected, _Pattern):
+        pattern_match = expected.match
+        return (
+            lambda values: values is not None
+            and pattern_match(", ".join(values)) is not None
+        )
+
+    if isinstance(expected, (list, tuple)):
+        expected_values = list(expected)
+        return lambda values: values == expected_values
+
+    return lambda values: values is not None and ", ".join(values) == expected
 
 
 class _RequestMatcher:
+    # Matchers may be evaluated by several threads at the same time,
+    # counting a call is short enough for a single lock to be shared by every matcher
+    _calls_lock = threading.Lock()
+
     def __init__(
         self,
         url: Union[str, Pattern, URL] = None,
         method: str = None,
         match_headers: dict = None,
         match_content: bytes = None,
+        match_json: Any = None,
+        url_template: str = None,
+        match_params: Dict[str, Union[str, List[str]]] = None,
+        url_normalized: bool = False,
     ):
+        if url is not None and url_template is not None:
+            raise ValueError("url and url_template cannot be provided together.")
+
         self.nb_calls = 0
         self.url = url
-        self.method = method
+        self.method = method.upper() if method else None
         self.headers = match_headers
+        self._header_matches = [
+            (header_name.lower(), _compile_header_match(header_value), header_value)
+            for header_name, header_value in (match_headers or {}).items()
+        ]
         self.content = match_content
-
-    def match(self, request: Request) -> bool:
-        return (
-            self._url_match(request)
-            and self._method_match(request)
-            and self._headers_match(request)
-            and self._content_match(request)
+        # Expected JSON is compared, as canonical text, to the canonical text of every request body
+        self.json_key = (
+            _canonical_json(_canonical_value(match_json))
+            if match_json is not None
+            else None
+        )
+        # Exact URLs are normalized once, as they will be compared to the string value of every request URL
+        # (unless url_normalized states that url is such a string value already)
+        self.exact_url = (
+            (str(url) if url_normalized else _normalize_url(str(url)))
+            if isinstance(url, (str, URL)) and url
+            else None
+        )
+        self.url_template = (
+            _URLTemplate(url_template, ignore_query=match_params is not None)
+            if url_template
+            else None
         )
+        # Expected query parameters (URL ones included) are compared, whatever their order,
+        # to the query parameters of every request
+        self.query_key: Optional[Tuple[Tuple[str, str], ...]] = None
+        if match_params is not None:
+            query = ""
+            if self.exact_url:
+                query = urllib.parse.urlsplit(self.exact_url).query
+                self.exact_url = _without_query(self.exact_url)
+            elif self.url_template:
+                query = urllib.parse.urlsplit(url_template).query
+            self.query_key = tuple(
+                sorted(
+                    urllib.parse.parse_qsl(query, keep_blank_values=True)
+                    + httpx.QueryParams(match_params).multi_items()
+                )
+            )
+        self._url_match = self._compile_url_match()
+        # Only collected if statistics are requested (see pytest --httpx-stats option)
+        self.stats: Optional[RegistrationStatistics] = None
+
+    def __str__(self) -> str:
+        method = self.method or "any method"
+        if self.exact_url:
+            url = self.exact_url
+        elif self.url_template:
+            url = self.url_template.template
+        elif isinstance(self.url, _Pattern):
+            url = f"matching {self.url.pattern!r}"
+        else:
+            url = "any URL"
+        description = f"{method} on {url}"
+        if self.headers:
+            description += f" with headers {self.headers}"
+        if self.content is not None:
+            description += " with content"
+        if self.json_key is not None:
+            description += f" with JSON {self.json_key}"
+        if self.query_key is not None:
+            description += f" with params {urllib.parse.urlencode(self.query_key)}"
+        return description
+
+    def _compile_url_match(self) -> Callable[[str], bool]:
+        if self.exact_url:
+            # Query string is matched on its own
+            if self.query_key is not None:
+                exact_url = self.exact_url
+                return lambda url: _without_query(url) == exact_url
+
+            return self.exact_url.__eq__
+
+        if self.url_template:
+            template_params = self.url_template.params
+            return lambda url: template_params(url) is not None
 
-    def _url_match(self, request: Request) -> bool:
-        if not self.url:
+        if isinstance(self.url, _Pattern):
+            pattern_match = self.url.match
+            return lambda url: pattern_match(url) is not None
+
+        return _match_any_url
+
+    def claim_first_call(self) -> bool:
+        """
+        Count a call only if this matcher was never called.
+
+        :return: True if the call was counted, False if matcher was already called.
+        """
+        with self._calls_lock:
+            if self.nb_calls:
+                return False
+            self.nb_calls += 1
             return True
 
-        # re.Pattern was introduced in Python 3.7
-        if isinstance(
-            self.url, re._pattern_type if hasattr(re, "_pattern_type") else re.Pattern
-        ):
-            return self.url.match(str(request.url)) is not None
+    def add_call(self):
+        with self._calls_lock:
+            self.nb_calls += 1
+
+    def index_key(self) -> Optional[Tuple[Optional[str], str]]:
+        """
+        Return the (method, URL) key this matcher can be indexed with.
+        None if the URL is not an exact one (regex or no URL) and thus cannot be indexed.
+        """
+        if not self.exact_url:
+            return None
+
+        return self.method, self.exact_url
 
-        if isinstance(self.url, str):
-            return URL(self.url) == request.url
+    def match(self, context: _RequestContext) -> bool:
+        return self._url_match(context.url) and self.match_without_url(context)
 
-        return self.url == request.url
+    def match_without_url(self, context: _RequestContext) -> bool:
+        """
+        Match every criterion except the URL, to be used when URL is already known to match.
+        """
+        return (
+            self._method_match(context)
+            and self._headers_match(context)
+            and self._content_match(context)
+            and self._json_match(context)
+            and self._params_match(context)
+        )
 
-    def _method_match(self, request: Request) -> bool:
+    def _method_match(self, context: _RequestContext) -> bool:
         if not self.method:
             return True
 
-        return request.method == self.method.upper()
+        return context.method == self.method
 
-    def _headers_match(self, request: Request) -> bool:
+    def _headers_match(self, context: _RequestContext) -> bool:
         if not self.headers:
             return True
 
-        return all(
-            request.headers.get(header_name) == header_value
-            for header_name, header_value in self.headers.items()
-        )
+        request_headers = context.headers
+        for header_name, header_match, _ in self._header_matches:
+            if not header_match(request_headers.get(header_name)):
+                return False
+        return True
 
-    def _content_match(self, request: Request) -> bool:
+    def _content_match(self, context: _RequestContext) -> bool:
         if self.content is None:
             return True
 
-        return request.read() == self.content
+        return context.content == self.content
+
+    def _json_match(self, context: _RequestContext) -> bool:
+        if self.json_key is None:
+            return True
+
+        return context.json_key == self.json_key
+
+    def _params_match(self, context: _RequestContext) -> bool:
+        if self.query_key is None:
+            return True
+
+        return context.query_key == self.query_key
+
+    def mismatches(self, context: _RequestContext) -> List[str]:
+        """
+        Describe every criterion this request does not match (empty if request match).
+
+        Only meant to be used to explain why a request cannot be matched, as it evaluates every criterion.
+        """
+        mismatches = []
+        if not self._url_match(context.url):
+            if isinstance(self.url, _Pattern):
+                mismatches.append(
+                    f"URL: {context.url} does not match {self.url.pattern!r}"
+                )
+            elif self.url_template:
+                mismatches.append(
+                    f"URL: {context.url} does not match {self.url_template.template}"
+                )
+            else:
+                mismatches.append(
+                    f"URL: expected {self.exact_url} but received {context.url}"
+                )
+        if not self._method_match(context):
+            mismatches.append(
+                f"method: expected {self.method} but received {context.method}"
+            )
+        for header_name, header_match, expected in self._header_matches:
+            values = context.headers.get(header_name)
+            if header_match(values):
+                continue
+            if expected is True:
+                mismatches.append(f"header {header_name}: expected to be sent")
+            elif expected is False or expected is None:
+                mismatches.append(
+                    f"header {header_name}: expected not to be sent but received {_shorten(', '.join(values))}"
+                )
+            else:
+                expected = (
+                    expected.pattern if isinstance(expected, _Pattern) else expected
+                )
+                received = (
+                    "nothing"
+                    if values is None
+                    else _shorten(
+                        values if isinstance(expected, list) else ", ".join(values)
+                    )
+                )
+                mismatches.append(
+                    f"header {header_name}: expected {_shorten(expected)} but received {received}"
+                )
+        if not self._content_match(context):
+            mismatches.append(
+                f"content: expected {_shorten(self.content)} but received {_shorten(context.content)}"
+            )
+        if not self._json_match(context):
+            received = (
+                "a body that is not JSON"
+                if context.json_key is None
+                else _shorten(context.json_key)
+            )
+            mismatches.append(
+                f"JSON: expected {_shorten(self.json_key)} but received {received}"
+            )
+        if not self._params_match(context):
+            mismatches.append(
+                f"params: expected {_shorten(urllib.parse.urlencode(self.query_key))} "
+                f"but received {_shorten(urllib.parse.urlencode(context.query_key))}"
+            )
+        return mismatches
+
+
+class _RouteNode:
+    """
+    Path segment of URL templates (node of a tree per origin), leading to static segments and to a parameter.
+    """
+
+    __slots__ = ("static", "parameter", "positions")
+
+    def __init__(self):
+        self.static: Dict[str, _RouteNode] = {}
+        self.parameter: Optional[_RouteNode] = None
+        # Position of every template ending with this segment, per query string (None for any query string)
+        self.positions: Dict[str, List[int]] = {}
+
+    def add(self, template: _URLTemplate, position: int):
+        node = self
+        for name, segment in template.segments:
+            if name:
+                if not node.parameter:
+                    node.parameter = _RouteNode()
+                node = node.parameter
+            else:
+                node = node.static.setdefault(segment, _RouteNode())
+        node.positions.setdefault(template.query, []).append(position)
+
+    def find(self, segments: List[str], query: str) -> List[int]:
+        """
+        Return position of every template matching these path segments and query (according to the registration order).
+        """
+        # Every node reached so far, a segment can match both a static segment and a parameter
+        nodes = [self]
+        for segment in segments:
+            reached = []
+            for node in nodes:
+                static = node.static.get(segment)
+                if static:
+                    reached.append(static)
+                # Parameters cannot be empty
+                if node.parameter and segment:
+                    reached.append(node.parameter)
+            if not reached:
+                return []
+            nodes = reached
+
+        positions = []
+        for node in nodes:
+            positions.extend(node.positions.get(query, ()))
+            # Templates matching query parameters on their own
+            positions.extend(node.positions.get(None, ()))
+        return sorted(positions)
+
+
+class _MatcherRegistry:
+    """
+    Registered (matcher, value) pairs.
+
+    Matchers on an exact URL are indexed by (method, URL) so that only a subset of registrations is evaluated
+    against a request. If they also expect a JSON body, they are indexed by (method, URL, canonical JSON) instead.
+    If they expect query parameters, they are indexed by (method, URL without query, sorted query parameters) instead.
+    Matchers on a regex URL are evaluated one by one, using the regex compiled upon registration.
+    Matchers on a URL template are stored in a tree of path segments per origin, so that a single walk through the
+    request path provides every template matching the request URL.
+    Other matchers (no URL) are always evaluated.
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[_RequestMatcher, Any]] = []
+        self._indexed: Dict[Tuple[Optional[str], str], List[int]] = {}
+        self._json_indexed: Dict[Tuple[Optional[str], str, str], List[int]] = {}
+        # URLs with JSON indexed matchers, request body is only parsed if needed
+        self._json_urls = set()
+        self._params_indexed: Dict[
+            Tuple[Optional[str], str, Tuple[Tuple[str, str], ...]], List[int]
+        ] = {}
+        # URLs (without query string) with query parameters indexed matchers
+        self._params_urls = set()
+        self._patterns: List[int] = []
+        self._templates: Dict[str, _RouteNode] = {}
+        self._any_url: List[int] = []
+        # Registrations may happen while requests are sent by other threads
+        self._registration_lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, registrations: List[Tuple[_RequestMatcher, Any]]):
+        """
+        Index every (matcher, value) at once, in the provided order.
+        """
+        with self._registration_lock:
+            for matcher, value in registrations:
+                position = len(self._entries)
+                self._entries.append((matcher, value))
+                key = matcher.index_key()
+                if key and matcher.query_key is not None:
+                    self._params_indexed.setdefault(
+                        key + (matcher.query_key,), []
+                    ).append(position)
+                    self._params_urls.add(matcher.exact_url)
+                elif key and matcher.json_key is not None:
+                    self._json_indexed.setdefault(key + (matcher.json_key,), []).append(
+                        position
+                    )
+                    self._json_urls.add(matcher.exact_url)
+                elif key:
+                    self._indexed.setdefault(key, []).append(position)
+                elif isinstance(matcher.url, _Pattern):
+                    self._patterns.append(position)
+                elif matcher.url_template:
+                    template = matcher.url_template
+                    self._templates.setdefault(template.origin, _RouteNode()).add(
+                        template, position
+                    )
+                else:
+                    self._any_url.append(position)
+
+    def clear(self):
+        with self._registration_lock:
+            self._entries.clear()
+            self._indexed.clear()
+            self._json_indexed.clear()
+            self._json_urls.clear()
+            self._params_indexed.clear()
+            self._params_urls.clear()
+            self._patterns.clear()
+            self._templates.clear()
+            self._any_url.clear()
+
+    def _matching_patterns(self, url: str) -> List[int]:
+        """
+        Return position of every regex matching this URL (according to the registration order).
+        """
+        return [
+            position
+            for position in self._patterns
+            if self._entries[position][0].url.match(url)
+        ]
+
+    def _matching_templates(self, url: str) -> List[int]:
+        """
+        Return position of every URL template matching this URL (according to the registration order).
+        """
+        if not self._templates:
+            return []
+
+        origin, segments, query = _split_url(url)
+        root = self._templates.get(origin)
+        return root.find(segments, query) if root else []
+
+    def find(self, context: _RequestContext) -> Optional[Tuple[_RequestMatcher, Any]]:
+        """
+        Return the first matching registration (matcher, value) not yet called,
+        or the last matching one (according to the registration order) if they were all called.
+        """
+        url = context.url
+        candidates = [
+            self._indexed.get((context.method, url), ()),
+            self._indexed.get((None, url), ()),
+            self._matching_patterns(url),
+            self._matching_templates(url),
+            self._any_url,
+        ]
+        if url in self._json_urls:
+            json_key = context.json_key
+            if json_key is not None:
+                candidates.append(
+                    self._json_indexed.get((context.method, url, json_key), ())
+                )
+                candidates.append(self._json_indexed.get((None, url, json_key), ()))
+        if self._params_urls and context.base_url in self._params_urls:
+            params_key = context.base_url, context.query_key
+            candidates.append(
+                self._params_indexed.get((context.method,) + params_key, ())
+            )
+            candidates.append(self._params_indexed.get((None,) + params_key, ()))
+        # Positions are appended in registration order, merging them keeps this order
+        positions = heapq.merge(*candidates)
+        last_matching = None
+        for position in positions:
+            matcher, value = self._entries[position]
+            # URL is already known to match for every position
+            if matcher.stats:
+                start = time.perf_counter()
+                matched = matcher.match_without_url(context)
+                matcher.stats.add_evaluation(time.perf_counter() - start)
+            else:
+                matched = matcher.match_without_url(context)
+            if not matched:
+                continue
+
+            # Return the first not yet called (lock is only acquired if it seems to be the case)
+            if not matcher.nb_calls and matcher.claim_first_call():
+                return matcher, value
+
+            last_matching = matcher, value
+
+        # No registration match this request
+        if not last_matching:
+            return
+
+        # Or the last registered
+        last_matching[0].add_call()
+        return last_matching
+
+
+class _RecordedStream(content_streams.ContentStream):
+    """
+    Stream the chunks of a non-replayable (iterator) body upon first consumption,
+    and replay the recorded chunks to every other consumer (even if first one is still consuming).
+    """
+
+    def __init__(self, stream: content_streams.ContentStream):
+        self._stream = stream
+        self._iterator = None
+        self._chunks: List[bytes] = []
+        self._consumed = False
+        self._lock = threading.Lock()
+        self._async_lock: Optional[asyncio.Lock] = None
+
+    def get_headers(self) -> Dict[str, str]:
+        return self._stream.get_headers()
+
+    def __iter__(self):
+        position = 0
+        while True:
+            with self._lock:
+                if position == len(self._chunks):
+                    if self._consumed:
+                        return
+                    if self._iterator is None:
+                        self._iterator = iter(self._stream)
+                    try:
+                        self._chunks.append(next(self._iterator))
+                    except StopIteration:
+                        self._consumed = True
+                        return
+                chunk = self._chunks[position]
+            position += 1
+            yield chunk
+
+    async def __aiter__(self):
+        # Synchronous iterators cannot be asynchronously iterated, but can still be sent to an asynchronous consumer
+        if isinstance(self._stream, content_streams.IteratorStream):
+            for chunk in self:
+                yield chunk
+            return
+
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        position = 0
+        while True:
+            async with self._async_lock:
+                if position == len(self._chunks):
+                    if self._consumed:
+                        return
+                    if self._iterator is None:
+                        self._iterator = self._stream.__aiter__()
+                    try:
+                        self._chunks.append(await self._iterator.__anext__())
+                    except StopAsyncIteration:
+                        self._consumed = True
+                        return
+                chunk = self._chunks[position]
+            position += 1
+            yield chunk
+
+
+class _MappedFileStream(content_streams.ContentStream):
+    """
+    Stream a range of a memory-mapped file by chunks.
+    Mapping is shared by every response, only streamed chunks are copied.
+    """
+
+    def __init__(
+        self,
+        mapped_file: Union[mmap.mmap, bytes],
+        start: int,
+        end: int,
+        chunk_size: int,
+    ):
+        self._mapped_file = mapped_file
+        self._start = start
+        self._end = end
+        self._chunk_size = chunk_size
+
+    def get_headers(self) -> Dict[str, str]:
+        return {"Content-Length": str(self._end - self._start)}
+
+    def __iter__(self):
+        for offset in range(self._start, self._end, self._chunk_size):
+            yield self._mapped_file[offset : min(offset + self._chunk_size, self._end)]
+
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
+
+
+class _ThrottledStream(content_streams.ContentStream):
+    """
+    Stream chunks of another stream at a maximum number of bytes per second.
+    """
+
+    def __init__(self, stream: content_streams.ContentStream, bandwidth: int):
+        self._stream = stream
+        self._bandwidth = bandwidth
+        # Send (at most) 20 slices per second
+        self._slice_size = max(1, bandwidth // 20)
+
+    def get_headers(self) -> Dict[str, str]:
+        return self._stream.get_headers()
+
+    def _slices(self, chunk: bytes):
+        for offset in range(0, len(chunk), self._slice_size):
+            yield chunk[offset : offset + self._slice_size]
+
+    def __iter__(self):
+        start, sent = time.monotonic(), 0
+        for chunk in self._stream:
+            for chunk_slice in self._slices(chunk):
+                sent += len(chunk_slice)
+                # Delay is computed from the start to avoid accumulating sleep inaccuracies
+                delay = start + sent / self._bandwidth - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                yield chunk_slice
+
+    async def __aiter__(self):
+        start, sent = time.monotonic(), 0
+        async for chunk in self._stream:
+            for chunk_slice in self._slices(chunk):
+                sent += len(chunk_slice)
+                delay = start + sent / self._bandwidth - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield chunk_slice
+
+
+def _seconds(latency: Union[float, Callable[[], float]]) -> float:
+    """
+    Return the number of seconds to wait for, latency can be provided as a fixed value or as a callable.
+    """
+    return latency() if callable(latency) else latency
+
+
+def _check_content(data: content_streams.RequestData, json: Any):
+    """
+    Reject, upon registration, body parameters that httpx would never be able to encode.
+    Only the type of data and json is checked, JSON values are only serialized upon first matching request.
+    """
+    if data is None:
+        if json is not None and not isinstance(
+            json, (dict, list, tuple, str, int, float, bool)
+        ):
+            raise TypeError(
+                f"Object of type {type(json).__name__} is not JSON serializable"
+            )
+    elif not isinstance(data, (dict, str, bytes)) and not (
+        hasattr(data, "__aiter__") or hasattr(data, "__iter__")
+    ):
+        raise TypeError(f"Unexpected type for 'data', {type(data)!r}")
+
+
+class _ResponseTemplate:
+    """
+    Registered response, a new httpx.Response instance is created for every matching request.
+
+    Body is encoded once, upon first matching request, every response shares the same body bytes
+    (or the same file mapping).
+    """
+
+    # Bodies are rarely encoded (once per registration), a single lock is shared by every response
+    _encoding_lock = threading.Lock()
+
+    def __init__(
+        self,
+        status_code: int,
+        http_version: str,
+        headers: Optional[dict],
+        data: content_streams.RequestData,
+        files: content_streams.RequestFiles,
+        json: Any,
+        boundary: Optional[bytes],
+        mapped_file: Optional[Union[mmap.mmap, bytes]] = None,
+        chunk_size: int = 65_536,
+        latency: Optional[Union[float, Callable[[], float]]] = None,
+        bandwidth: Optional[int] = None,
+    ):
+        self.status_code = status_code
+        self.http_version = http_version
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.headers = list(headers.items()) if headers else []
+        self._body: Optional[bytes] = None
+        self._stream: Optional[_RecordedStream] = None
+        self._mapped_file: Optional[Union[mmap.mmap, bytes]] = None
+        self._mapped_range = (0, 0)
+        self._chunk_size = chunk_size
+        # Parameters of the body until it is encoded
+        self._content: Optional[tuple] = None
+
+        if mapped_file is not None:
+            self._mapped_file = mapped_file
+            self._mapped_range = (0, len(mapped_file))
+        else:
+            _check_content(data, json)
+            self._content = (data, files, json, boundary)
+
+    def _encode(self):
+        with self._encoding_lock:
+            # Body might have been encoded by another thread in the meantime
+            if self._content is None:
+                return
+
+            data, files, json, boundary = self._content
+            stream = content_streams.encode(
+                data=data, files=files, json=json, boundary=boundary
+            )
+            if stream.can_replay():
+                self._body = b"".join(stream)
+            else:
+                self._stream = _RecordedStream(stream)
+            self._content = None
+
+    @classmethod
+    def from_mapped_range(
+        cls,
+        status_code: int,
+        http_version: str,
+        headers: List[Tuple[str, str]],
+        mapped_file: mmap.mmap,
+        start: int,
+        end: int,
+    ) -> "_ResponseTemplate":
+        """
+        Create a response whose body is a range of an already memory-mapped file.
+        """
+        response = cls(status_code, http_version, None, None, None, None, None)
+        response.headers = headers
+        response._mapped_file = mapped_file
+        response._mapped_range = (start, end)
+        response._content = None
+        return response
+
+    def to_response(self, request: Request) -> Response:
+        if self._content is not None:
+            self._encode()
+
+        if self._mapped_file is not None:
+            stream = _MappedFileStream(
+                self._mapped_file, *self._mapped_range, self._chunk_size
+            )
+        elif self._body is not None:
+            stream = content_streams.ByteStream(self._body)
+        else:
+            stream = self._stream
+
+        if self.bandwidth:
+            stream = _ThrottledStream(stream, self.bandwidth)
+
+        return Response(
+            status_code=self.status_code,
+            http_version=self.http_version,
+            headers=self.headers,
+            stream=stream,
+            request=request,
+        )
+
+    def __repr__(self) -> str:
+        return f"<Response [{self.status_code} {StatusCode.get_reason_phrase(self.status_code)}]>"
+
+
+class _RequestJournal:
+    """
+    Received requests, retained according to a retention policy:
+     * all: Every request is retained (default).
+     * last: Only the last max_requests requests are retained.
+     * metadata: Every request is retained without its body.
+     * none: No request is retained.
+    Total number of received requests is always available.
+
+    Retained requests are indexed by method and URL as they are received,
+    so that requests retrieval only evaluates the requests sharing the same method or URL.
+    """
+
+    policies = ("all", "last", "metadata", "none")
+
+    def __init__(self):
+        self.policy = "all"
+        self.nb_requests = 0
+        self._max_requests: Optional[int] = None
+        # Sequence number of every retained request (in order of reception)
+        self._contexts: Dict[int, _RequestContext] = collections.OrderedDict()
+        self._by_method: Dict[str, Deque[int]] = {}
+        self._by_url: Dict[str, Deque[int]] = {}
+        self._lock = threading.Lock()
+
+    def retain(self, policy: str, max_requests: Optional[int]):
+        if policy not in self.policies:
+            raise ValueError(
+                f"{policy} is not a valid retention policy. Valid policies are {', '.join(self.policies)}."
+            )
+        if (policy == "last") != (max_requests is not None):
+            raise ValueError(
+                "max_requests must be provided if (and only if) retention policy is last."
+            )
+        if max_requests is not None and max_requests < 0:
+            raise ValueError(
+                f"max_requests must be a positive number (or 0), {max_requests} was provided."
+            )
+
+        with self._lock:
+            self.policy = policy
+            self._max_requests = max_requests
+            if policy == "none":
+                self._contexts.clear()
+                self._by_method.clear()
+                self._by_url.clear()
+            self._discard_oldest()
+
+    def record(self, context: _RequestContext):
+        if self.policy == "metadata":
+            request = context.request
+            metadata = Request(request.method, request.url)
+            # Sent headers only, not the default ones added upon request creation
+            metadata.headers = request.headers
+            context = _RequestContext(metadata)
+
+        with self._lock:
+            sequence = self.nb_requests
+            self.nb_requests += 1
+            if self.policy == "none":
+                return
+
+            self._contexts[sequence] = context
+            self._by_method.setdefault(context.method, collections.deque()).append(
+                sequence
+            )
+            self._by_url.setdefault(context.url, collections.deque()).append(sequence)
+            self._discard_oldest()
+
+    def _discard_oldest(self):
+        """
+        Discard the oldest requests exceeding the maximum number of retained requests (if any).
+        """
+        if self._max_requests is None:
+            return
+
+        while len(self._contexts) > self._max_requests:
+            sequence, context = self._contexts.popitem(last=False)
+            # Oldest request is always the first one of its indexes
+            for index, key in (
+                (self._by_method, context.method),
+                (self._by_url, context.url),
+            ):
+                sequences = index[key]
+                sequences.popleft()
+                if not sequences:
+                    del index[key]
+
+    def find(self, matcher: _RequestMatcher) -> List[_RequestContext]:
+        """
+        Return every retained request matching (in order of reception).
+        """
+        with self._lock:
+            candidates = None
+            # Requests are indexed by full URL, query string included (matched on its own with match_params)
+            if matcher.exact_url and matcher.query_key is None:
+                candidates = self._by_url.get(matcher.exact_url, ())
+            if matcher.method:
+                by_method = self._by_method.get(matcher.method, ())
+                if candidates is None or len(by_method) < len(candidates):
+                    candidates = by_method
+            if candidates is None:
+                contexts = list(self._contexts.values())
+            else:
+                contexts = [self._contexts[sequence] for sequence in candidates]
+
+        return [context for context in contexts if matcher.match(context)]
+
+
+class _Callback:
+    def __init__(
+        self,
+        callback: Callable,
+        run_in_executor: bool,
+        latency: Optional[Union[float, Callable[[], float]]],
+    ):
+        self.callback = callback
+        self.run_in_executor = run_in_executor
+        self.latency = latency
+        # Only collected if statistics are requested (see pytest --httpx-stats option)
+        self.stats: Optional[RegistrationStatistics] = None
+
+    def __repr__(self) -> str:
+        return repr(self.callback)
 
 
 class HTTPXMock:
     def __init__(self):
-        self._requests: List[Request] = []
-        self._responses: List[Tuple[_RequestMatcher, Response]] = []
-        self._callbacks: List[Tuple[_RequestMatcher, Callable]] = []
+        self._requests = _RequestJournal()
+        self._responses = _MatcherRegistry()
+        self._callbacks = _MatcherRegistry()
+        self._recorder: Optional[CassetteRecorder] = None
+        self._forward_dispatcher: Optional[URLLib3Dispatcher] = None
+        # Provided by the httpx_mock fixture if statistics are requested (see pytest --httpx-stats option)
+        self._statistics: Optional[SessionStatistics] = None
+        # Dispatchers are stateless, the same ones are used by every client (for every request)
+        self._sync_dispatcher = _PytestSyncDispatcher(self)
+        self._async_dispatcher = _PytestAsyncDispatcher(self)
+        self._server: Optional[MockServer] = None
+        # Memory-mapped files used by this test (response bodies and cassettes)
+        self._shared_files: List[SharedFile] = []
 
     def add_response(
         self,
@@ -81,6 +1172,10 @@ class HTTPXMock:
         files: content_streams.RequestFiles = None,
         json: Any = None,
         boundary: bytes = None,
+        file: Union[str, os.PathLike] = None,
+        chunk_size: int = 65_536,
+        latency: Union[float, Callable[[], float]] = None,
+        bandwidth: int = None,
         **matchers,
     ):
         """
@@ -94,120 +1189,450 @@ class HTTPXMock:
         :param files: Multipart files.
         :param json: HTTP body of the response (if JSON should be used as content type) if data is not provided.
         :param boundary: Multipart boundary if files is provided.
+        :param file: Path to the file containing the HTTP body of the response, if data, files and json are not provided.
+        File is memory-mapped and streamed, it is never fully loaded in memory.
+        :param chunk_size: Size (in bytes) of each streamed chunk if file is provided. Default to 64 KiB.
+        :param latency: Number of seconds to wait for before sending the response. Can be a number or a callable
+        returning a number (to use a distribution). Default to no latency.
+        :param bandwidth: Maximum number of body bytes streamed per second. Default to no limit.
         :param url: Full URL identifying the request(s) to match. Can be a str, a re.Pattern instance or a httpx.URL instance.
+        :param url_template: Full URL identifying the request(s) to match, where path segments such as {name} match any
+        (non empty) segment. Cannot be provided with url.
         :param method: HTTP method identifying the request(s) to match.
-        :param match_headers: HTTP headers identifying the request(s) to match. Must be a dictionary.
+        :param match_headers: HTTP headers identifying the request(s) to match. Must be a dictionary, header names are
+        case-insensitive and values can be a str (every received value, comma separated), a list of str (every received
+        value), a re.Pattern instance (matching every received value, comma separated), True (header must be received) or
+        False or None (header must not be received).
         :param match_content: Full HTTP body identifying the request(s) to match. Must be bytes.
+        :param match_json: JSON body identifying the request(s) to match. Compared once parsed (whatever the key order, spacing or number representation such as 1 and 1.0).
+        :param match_params: Query parameters identifying the request(s) to match, in addition to the ones of the URL.
+        Must be a dictionary, values can be a str or a list of str (repeated parameter). Compared whatever the
+        parameters order (query parameters of the URL included).
+        """
+        self._register(
+            self._responses,
+            [
+                self._new_response(
+                    status_code=status_code,
+                    http_version=http_version,
+                    headers=headers,
+                    data=data,
+                    files=files,
+                    json=json,
+                    boundary=boundary,
+                    file=file,
+                    chunk_size=chunk_size,
+                    latency=latency,
+                    bandwidth=bandwidth,
+                    **matchers,
+                )
+            ],
+        )
+
+    def add_responses(self, routes: Iterable[Dict[str, Any]]):
+        """
+        Mock the responses that will be sent if a request match, at once.
+
+        Every response is registered in a single pass and its body is only encoded upon first matching request,
+        making it faster than calling add_response for every route of a large route table.
+
+        :param routes: Parameters of add_response, one dictionary per response.
+        Responses are registered in the iteration order.
         """
-        response = Response(
+        self._register(
+            self._responses, [self._new_response(**route) for route in routes]
+        )
+
+    def load_responses(self, path: Union[str, os.PathLike]):
+        """
+        Mock the responses listed in a route table file (see add_responses).
+
+        :param path: Path to the route table. A JSON (.json) or YAML (.yaml, .yml) list of add_response
+        parameters (one mapping per response), or a CSV (.csv) file with add_response parameters as columns
+        (one row per response, empty cells are not provided). In a CSV file, headers, json, match_headers and
+        match_json cells are JSON. YAML route tables require PyYAML.
+        """
+        self.add_responses(load_routes(path))
+
+    def _new_response(
+        self,
+        status_code: int = 200,
+        http_version: str = "HTTP/1.1",
+        headers: dict = None,
+        data: content_streams.RequestData = None,
+        files: content_streams.RequestFiles = None,
+        json: Any = None,
+        boundary: bytes = None,
+        file: Union[str, os.PathLike] = None,
+        chunk_size: int = 65_536,
+        latency: Union[float, Callable[[], float]] = None,
+        bandwidth: int = None,
+        **matchers,
+    ) -> Tuple[_RequestMatcher, _ResponseTemplate]:
+        if file is not None:
+            if data is not None or files is not None or json is not None:
+                raise ValueError("file cannot be provided with data, files or json.")
+            mapped_file = self._acquire_file(file).mapping
+        else:
+            mapped_file = None
+
+        response = _ResponseTemplate(
             status_code=status_code,
             http_version=http_version,
-            headers=list(headers.items()) if headers else [],
-            stream=content_streams.encode(
-                data=data, files=files, json=json, boundary=boundary
-            ),
-            request=None,  # Will be set upon reception of the actual request
+            headers=headers,
+            data=data,
+            files=files,
+            json=json,
+            boundary=boundary,
+            mapped_file=mapped_file,
+            chunk_size=chunk_size,
+            latency=latency,
+            bandwidth=bandwidth,
         )
-        self._responses.append((_RequestMatcher(**matchers), response))
+        return _RequestMatcher(**matchers), response
 
-    def add_callback(self, callback: Callable, **matchers):
+    def add_callback(
+        self,
+        callback: Callable,
+        run_in_executor: bool = False,
+        latency: Union[float, Callable[[], float]] = None,
+        **matchers,
+    ):
         """
         Mock the action that will take place if a request match.
 
         :param callback: The callable that will be called upon reception of the matched request.
-        It must expect at least 2 parameters:
+        It must expect at least 2 parameters (3 if url_template is provided):
          * request: The received request.
          * timeout: The timeout linked to the request.
+         * url_params: Value of every path parameter, only provided if url_template is provided.
         It should return an httpx.Response instance.
+        It can be a coroutine function (async def) in case request is sent by an asynchronous client.
+        :param run_in_executor: Execute callback in the default event loop executor (a thread pool),
+        instead of blocking the event loop, in case request is sent by an asynchronous client. Default to False.
+        :param latency: Number of seconds to wait for before executing the callback. Can be a number or a callable
+        returning a number (to use a distribution). Default to no latency.
         :param url: Full URL identifying the request(s) to match. Can be a str, a re.Pattern instance or a httpx.URL instance.
+        :param url_template: Full URL identifying the request(s) to match, where path segments such as {name} match any
+        (non empty) segment. Cannot be provided with url.
         :param method: HTTP method identifying the request(s) to match.
-        :param match_headers: HTTP headers identifying the request(s) to match. Must be a dictionary.
+        :param match_headers: HTTP headers identifying the request(s) to match. Must be a dictionary, header names are
+        case-insensitive and values can be a str (every received value, comma separated), a list of str (every received
+        value), a re.Pattern instance (matching every received value, comma separated), True (header must be received) or
+        False or None (header must not be received).
         :param match_content: Full HTTP body identifying the request(s) to match. Must be bytes.
+        :param match_json: JSON body identifying the request(s) to match. Compared once parsed (whatever the key order, spacing or number representation such as 1 and 1.0).
+        :param match_params: Query parameters identifying the request(s) to match, in addition to the ones of the URL.
+        Must be a dictionary, values can be a str or a list of str (repeated parameter). Compared whatever the
+        parameters order (query parameters of the URL included).
+        """
+        self._register(
+            self._callbacks,
+            [
+                (
+                    _RequestMatcher(**matchers),
+                    _Callback(callback, run_in_executor, latency),
+                )
+            ],
+        )
+
+    def record_cassette(self, path: Union[str, os.PathLike]):
+        """
+        Forward requests that cannot be matched to the actual server (instead of failing) and record every exchange.
+
+        Recorded exchanges are written to the cassette file at the end of the test.
+
+        :param path: Path to the cassette file (will be overwritten).
         """
-        self._callbacks.append((_RequestMatcher(**matchers), callback))
+        self._recorder = CassetteRecorder(path)
+
+    def replay_cassette(self, path: Union[str, os.PathLike]):
+        """
+        Mock the response of every exchange recorded in a cassette file (see record_cassette).
+
+        Responses are matched on method and URL, in the recorded order.
+        Cassette file is memory-mapped, response bodies are never fully loaded in memory.
+        Cassette file is mapped and parsed once per process (as long as it is not modified).
+
+        :param path: Path to the cassette file.
+        """
+        shared_file = self._acquire_file(path)
+        if shared_file.exchanges is None:
+            shared_file.exchanges = parse_cassette(path, shared_file.mapping)
+        mapping, exchanges = shared_file.mapping, shared_file.exchanges
+        self._register(
+            self._responses,
+            [
+                (
+                    # Recorded URLs are the string value of a request URL, thus already normalized
+                    _RequestMatcher(url=url, method=method, url_normalized=True),
+                    _ResponseTemplate.from_mapped_range(
+                        status_code=status_code,
+                        http_version=http_version,
+                        headers=headers,
+                        mapped_file=mapping,
+                        start=offset,
+                        end=offset + length,
+                    ),
+                )
+                for (
+                    method,
+                    url,
+                    status_code,
+                    http_version,
+                    headers,
+                    offset,
+                    length,
+                ) in exchanges
+            ],
+        )
+
+    def _acquire_file(self, path: Union[str, os.PathLike]) -> SharedFile:
+        shared_file = _shared_files.acquire(path)
+        self._shared_files.append(shared_file)
+        return shared_file
+
+    def start_server(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Serve registered responses and callbacks over HTTP/1.1 to clients not using httpx (or other processes).
+
+        Received requests are matched and can be retrieved the same way as requests sent using httpx.
+        Server is stopped at the end of the test.
+
+        :param host: Interface the server listens on. Default to the loopback interface.
+        :param port: Port the server listens on. Default to a port chosen by the operating system.
+        :return: URL of the server, such as http://127.0.0.1:54321
+        """
+        if self._server:
+            raise ValueError(f"Server is already listening on {self._server.url}.")
+
+        server = MockServer(
+            lambda request: self._handle_async_request(request, timeout=None)
+        )
+        url = server.start(host, port)
+        self._server = server
+        return url
+
+    def _register(
+        self,
+        registry: _MatcherRegistry,
+        registrations: List[
+            Tuple[_RequestMatcher, Union[_ResponseTemplate, _Callback]]
+        ],
+    ):
+        if self._statistics:
+            # Statistics are aggregated per place where the registration is performed (outside of this module)
+            frame = sys._getframe(1)
+            while frame.f_code.co_filename == __file__:
+                frame = frame.f_back
+            location = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+            for matcher, value in registrations:
+                kind = "callback" if isinstance(value, _Callback) else "response"
+                matcher.stats = self._statistics.registration(
+                    kind=kind,
+                    location=location,
+                    registration=f"{value!r} on {matcher}",
+                )
+                if isinstance(value, _Callback):
+                    value.stats = matcher.stats
+        registry.add(registrations)
 
     def _handle_request(self, request: Request, *args, **kwargs) -> Response:
-        self._requests.append(request)
+        context = self._record(request)
 
-        response = self._get_response(request)
+        response = self._get_response(context)
         if response:
+            if response.latency:
+                time.sleep(_seconds(response.latency))
+            return response.to_response(request)
+
+        matching_callback = self._callbacks.find(context)
+        if matching_callback:
+            matcher, callback = matching_callback
+            if callback.latency:
+                time.sleep(_seconds(callback.latency))
+            if matcher.url_template:
+                kwargs["url_params"] = matcher.url_template.params(context.url)
+            start = time.perf_counter()
+            response = callback.callback(request=request, *args, **kwargs)
+            if callback.stats:
+                callback.stats.add_callback_execution(time.perf_counter() - start)
+            if inspect.isawaitable(response):
+                # Avoid a warning about the coroutine never being awaited
+                if inspect.iscoroutine(response):
+                    response.close()
+                raise httpx.HTTPError(
+                    f"Asynchronous callback {callback} cannot be executed for a synchronous request.",
+                    request=request,
+                )
             return response
 
-        callback = self._get_callback(request)
-        if callback:
-            return callback(request=request, *args, **kwargs)
+        if self._recorder:
+            return self._forward(request, *args, **kwargs)
 
-        raise httpx.HTTPError(
-            f"No mock can be found for {request.method} request on {request.url}.",
-            request=request,
-        )
+        raise self._no_mock_error(context)
 
-    def _get_response(self, request: Request) -> Optional[Response]:
-        responses = [
-            (matcher, response)
-            for matcher, response in self._responses
-            if matcher.match(request)
-        ]
+    def _forward(self, request: Request, *args, **kwargs) -> Response:
+        if not self._forward_dispatcher:
+            self._forward_dispatcher = URLLib3Dispatcher()
+        response = self._forward_dispatcher.send(request, *args, **kwargs)
+        # Raw body is recorded (and sent back) so that recorded headers are still accurate (Content-Encoding)
+        body = b"".join(response.iter_raw())
+        return self._recorder.record(request, response, body)
 
-        # No response match this request
-        if not responses:
-            return
+    async def _forward_async(self, request: Request, *args, **kwargs) -> Response:
+        async with ConnectionPool() as dispatcher:
+            response = await dispatcher.send(request, *args, **kwargs)
+            body = b"".join([part async for part in response.aiter_raw()])
+        return self._recorder.record(request, response, body)
 
-        # Responses match this request
-        for matcher, response in responses:
-            # Return the first not yet called
-            if not matcher.nb_calls:
-                matcher.nb_calls += 1
-                response.request = request
-                return response
+    async def _handle_async_request(
+        self, request: Request, *args, **kwargs
+    ) -> Response:
+        # Asynchronous body cannot be read by matchers, read it once beforehand
+        if isinstance(request.stream, content_streams.AsyncIteratorStream):
+            await request.aread()
 
-        # Or the last registered
-        matcher.nb_calls += 1
-        response.request = request
-        return response
+        context = self._record(request)
+
+        response = self._get_response(context)
+        if response:
+            if response.latency:
+                await asyncio.sleep(_seconds(response.latency))
+            return response.to_response(request)
+
+        matching_callback = self._callbacks.find(context)
+        if matching_callback:
+            matcher, callback = matching_callback
+            if callback.latency:
+                await asyncio.sleep(_seconds(callback.latency))
+            if matcher.url_template:
+                kwargs["url_params"] = matcher.url_template.params(context.url)
+            start = time.perf_counter()
+            if callback.run_in_executor:
+                response = await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    functools.partial(
+                        callback.callback, request=request, *args, **kwargs
+                    ),
+                )
+            else:
+                response = callback.callback(request=request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+            if callback.stats:
+                callback.stats.add_callback_execution(time.perf_counter() - start)
+            return response
+
+        if self._recorder:
+            return await self._forward_async(request, *args, **kwargs)
+
+        raise self._no_mock_error(context)
+
+    def _record(self, request: Request) -> _RequestContext:
+        context = _RequestContext(request)
+        self._requests.record(context)
+        if self._statistics:
+            self._statistics.add_request(context.method, context.url)
+        return context
+
+    def _no_mock_error(self, context: _RequestContext) -> httpx.HTTPError:
+        if self._statistics:
+            self._statistics.add_unmatched_request(context.method, context.url)
+        message = f"No mock can be found for {context.method} request on {context.url}."
+        near_misses = self._near_misses(context)
+        if near_misses:
+            message += f"\n{near_misses}"
+        return httpx.HTTPError(message, request=context.request)
 
-    def _get_callback(self, request: Request) -> Optional[Callable]:
-        callbacks = [
-            (matcher, callback)
-            for matcher, callback in self._callbacks
-            if matcher.match(request)
+    def _near_misses(self, context: _RequestContext, top: int = 3) -> str:
+        """
+        Describe the registrations that are the closest to match this request (failing the least criteria).
+        """
+        registrations = [
+            (matcher.mismatches(context), position, f"{value!r} on {matcher}")
+            for position, (matcher, value) in enumerate(
+                itertools.chain(self._responses, self._callbacks)
+            )
         ]
+        if not registrations:
+            return ""
 
-        # No callback match this request
-        if not callbacks:
-            return
+        closest = sorted(
+            registrations,
+            key=lambda registration: (len(registration[0]), registration[1]),
+        )[:top]
+        lines = [f"Closest registrations ({len(closest)} out of {len(registrations)}):"]
+        for mismatches, _, registration in closest:
+            lines.append(f" * {registration}")
+            lines.extend(f"   - {mismatch}" for mismatch in mismatches)
+        return "\n".join(lines)
 
-        # Callbacks match this request
-        for matcher, callback in callbacks:
-            # Return the first not yet called
-            if not matcher.nb_calls:
-                matcher.nb_calls += 1
-                return callback
+    def _get_response(self, context: _RequestContext) -> Optional[_ResponseTemplate]:
+        matching_response = self._responses.find(context)
+        return matching_response[1] if matching_response else None
 
-        # Or the last registered
-        matcher.nb_calls += 1
-        return callback
+    def retain_requests(self, policy: str = "all", max_requests: int = None):
+        """
+        Define which sent requests are retained (and can be retrieved using get_requests and get_request).
+
+        :param policy: Retention policy. Default to all.
+         * all: Every request is retained.
+         * last: Only the last max_requests requests are retained.
+         * metadata: Every request is retained without its body (method, URL and headers only).
+         * none: No request is retained.
+        :param max_requests: Maximum number of retained requests. Must be provided if (and only if) policy is last.
+        Must be a positive number (or 0).
+        """
+        self._requests.retain(policy, max_requests)
+
+    @property
+    def nb_requests(self) -> int:
+        """
+        Total number of sent requests, whatever the retention policy.
+        """
+        return self._requests.nb_requests
 
     def get_requests(self, **matchers) -> List[Request]:
         """
         Return all requests sent that match (empty list if no requests were matched).
 
+        Only retained requests can be returned (see retain_requests):
+         * all: Every request can be returned.
+         * last: Only the last max_requests requests can be returned.
+         * metadata: Every request can be returned, without body (match_content can only match empty content).
+         * none: No request can be returned.
+
         :param url: Full URL identifying the requests to retrieve. Can be a str, a re.Pattern instance or a httpx.URL instance.
+        :param url_template: Full URL identifying the requests to retrieve, where path segments such as {name} match any
+        (non empty) segment.
         :param method: HTTP method identifying the requests to retrieve. Must be a upper cased string value.
-        :param match_headers: HTTP headers identifying the requests to retrieve. Must be a dictionary.
+        :param match_headers: HTTP headers identifying the requests to retrieve. Must be a dictionary (see add_response).
         :param match_content: Full HTTP body identifying the requests to retrieve. Must be bytes.
+        :param match_json: JSON body identifying the requests to retrieve. Compared once parsed (whatever the key order, spacing or number representation such as 1 and 1.0).
+        :param match_params: Query parameters identifying the requests to retrieve, in addition to the ones of the URL.
+        Must be a dictionary, values can be a str or a list of str (repeated parameter). Compared whatever the
+        parameters order (query parameters of the URL included).
         """
         matcher = _RequestMatcher(**matchers)
-        return [request for request in self._requests if matcher.match(request)]
+        return [context.request for context in self._requests.find(matcher)]
 
     def get_request(self, **matchers) -> Optional[Request]:
         """
         Return the single request that match (or None).
 
+        Only retained requests can be returned (see retain_requests and get_requests).
+
         :param url: Full URL identifying the request to retrieve. Can be a str, a re.Pattern instance or a httpx.URL instance.
+        :param url_template: Full URL identifying the request to retrieve, where path segments such as {name} match any
+        (non empty) segment.
         :param method: HTTP method identifying the request to retrieve. Must be a upper cased string value.
-        :param match_headers: HTTP headers identifying the request to retrieve. Must be a dictionary.
+        :param match_headers: HTTP headers identifying the request to retrieve. Must be a dictionary (see add_response).
         :param match_content: Full HTTP body identifying the request to retrieve. Must be bytes.
+        :param match_json: JSON body identifying the request to retrieve. Compared once parsed (whatever the key order, spacing or number representation such as 1 and 1.0).
+        :param match_params: Query parameters identifying the request to retrieve, in addition to the ones of the URL.
+        Must be a dictionary, values can be a str or a list of str (repeated parameter). Compared whatever the
+        parameters order (query parameters of the URL included).
         :raises AssertionError: in case more than one request match.
         """
         requests = self.get_requests(**matchers)
@@ -217,9 +1642,39 @@ class HTTPXMock:
         return requests[0] if requests else None
 
     def assert_and_reset(self):
+        self._stop_server()
+        self._save_statistics()
+        self._save_cassette()
+        self._release_files()
         self._assert_responses_sent()
         self._assert_callbacks_executed()
 
+    def _stop_server(self):
+        if self._server:
+            self._server.stop()
+            self._server = None
+
+    def _save_statistics(self):
+        for matcher, value in self._responses:
+            if matcher.stats:
+                matcher.stats.add_hits(matcher.nb_calls)
+        for matcher, value in self._callbacks:
+            if matcher.stats:
+                matcher.stats.add_hits(matcher.nb_calls)
+
+    def _save_cassette(self):
+        if self._forward_dispatcher:
+            self._forward_dispatcher.close()
+            self._forward_dispatcher = None
+        if self._recorder:
+            self._recorder.save()
+            self._recorder = None
+
+    def _release_files(self):
+        for shared_file in self._shared_files:
+            _shared_files.release(shared_file)
+        self._shared_files.clear()
+
     def _assert_responses_sent(self):
         responses_not_called = [
             response for matcher, response in self._responses if not matcher.nb_calls
@@ -252,26 +1707,62 @@ class _PytestAsyncDispatcher(AsyncDispatcher):
         self.mock = mock
 
     async def send(self, *args, **kwargs) -> Response:
-        return self.mock._handle_request(*args, **kwargs)
+        return await self.mock._handle_async_request(*args, **kwargs)
 
 
-@pytest.fixture
-def httpx_mock(monkeypatch) -> HTTPXMock:
-    mock = HTTPXMock()
+# Files memory-mapped for the whole session (or pytest-xdist worker), shared by every test using them
+_shared_files = SharedFiles()
+
+# Mock of the test currently running (if it requested the httpx_mock fixture).
+# A module attribute (and not a context variable) as requests can be sent by any thread started by the test.
+_active_mock: Optional[HTTPXMock] = None
+
+
+def _mocked_dispatcher_for_url(
+    original: Callable, dispatcher: Callable[[HTTPXMock], Any]
+) -> Callable:
+    def dispatcher_for_url(self, url: URL):
+        mock = _active_mock
+        # Clients used by tests that did not request httpx_mock (or outside of tests) are not mocked
+        if mock is None:
+            return original(self, url)
+        return dispatcher(mock)
+
+    return dispatcher_for_url
+
+
+@pytest.fixture(scope="session")
+def _httpx_dispatchers_patch():
+    """
+    Patch httpx clients once per session (or per pytest-xdist worker), tests only swap the active mock.
+    """
+    sync_original = httpx.client.Client.dispatcher_for_url
+    async_original = httpx.client.AsyncClient.dispatcher_for_url
     # Mock synchronous requests
-    monkeypatch.setattr(
-        httpx.client.Client,
-        "dispatcher_for_url",
-        lambda self, url: _PytestSyncDispatcher(mock),
+    httpx.client.Client.dispatcher_for_url = _mocked_dispatcher_for_url(
+        sync_original, operator.attrgetter("_sync_dispatcher")
     )
     # Mock asynchronous requests
-    monkeypatch.setattr(
-        httpx.client.AsyncClient,
-        "dispatcher_for_url",
-        lambda self, url: _PytestAsyncDispatcher(mock),
+    httpx.client.AsyncClient.dispatcher_for_url = _mocked_dispatcher_for_url(
+        async_original, operator.attrgetter("_async_dispatcher")
     )
-    yield mock
-    mock.assert_and_reset()
+    yield
+    httpx.client.Client.dispatcher_for_url = sync_original
+    httpx.client.AsyncClient.dispatcher_for_url = async_original
+    _shared_files.close()
+
+
+@pytest.fixture
+def httpx_mock(_httpx_dispatchers_patch, request) -> HTTPXMock:
+    global _active_mock
+    mock = HTTPXMock()
+    mock._statistics = session_statistics(request.config)
+    _active_mock = mock
+    try:
+        yield mock
+        mock.assert_and_reset()
+    finally:
+        _active_mock = None
 
 
 # TODO Allow to assert requests content / files / whatever
@@ -0,0 +1,237 @@
+import asyncio
+import functools
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, List, Optional
+
+import pytest
+
+from pytest_httpx._httpx_mock import HTTPXMock
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values (0 if there is no value).
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class LoadReport:
+    """
+    Measures of a load run: every call to the client function, and every request handled by the mock.
+    """
+
+    def __init__(
+        self,
+        calls: int,
+        duration: float,
+        latencies: List[float],
+        max_in_flight: int,
+        requests: int,
+        mock_time: float,
+        errors: List[Exception],
+    ):
+        # Number of calls to the client function
+        self.calls = calls
+        # Wall clock time (in seconds) of the whole run
+        self.duration = duration
+        # Number of calls to the client function per second
+        self.throughput = calls / duration if duration else 0.0
+        latencies = sorted(latencies)
+        # Duration (in seconds) of a call to the client function
+        self.latency_p50 = _percentile(latencies, 50)
+        self.latency_p99 = _percentile(latencies, 99)
+        self.latency_max = latencies[-1] if latencies else 0.0
+        # Maximum number of calls to the client function running at the same time
+        self.max_in_flight = max_in_flight
+        # Number of requests handled by the mock (a call can send any number of requests)
+        self.requests = requests
+        # Cumulative time (in seconds) spent by the mock handling requests (simulated latency included)
+        self.mock_time = mock_time
+        # Average time (in seconds) spent by the mock handling a request
+        self.mock_overhead = mock_time / requests if requests else 0.0
+        # Average time (in seconds) spent by a call to the client function outside of the mock
+        self.client_overhead = (
+            max(sum(latencies) - mock_time, 0.0) / calls if calls else 0.0
+        )
+        # Exceptions raised by the client function (a failed call is still measured)
+        self.errors = errors
+
+    def __str__(self) -> str:
+        return (
+            f"{self.calls} calls in {self.duration:.3f}s ({self.throughput:.0f} calls/s), "
+            f"latency p50 {self.latency_p50 * 1_000:.3f}ms, p99 {self.latency_p99 * 1_000:.3f}ms, "
+            f"max {self.latency_max * 1_000:.3f}ms, {self.max_in_flight} max in-flight, "
+            f"{self.requests} requests handled by mock ({self.mock_overhead * 1_000_000:.1f}us per request), "
+            f"client overhead {self.client_overhead * 1_000_000:.1f}us per call, {len(self.errors)} errors."
+        )
+
+
+class _Measures:
+    """
+    Measures collected while a load run is in progress, by any thread.
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.mock_time = 0.0
+        self.errors: List[Exception] = []
+        self._lock = threading.Lock()
+
+    def call_started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def call_ended(self, latency: float, error: Optional[Exception]):
+        with self._lock:
+            self.in_flight -= 1
+            self.latencies.append(latency)
+            if error is not None:
+                self.errors.append(error)
+
+    def request_handled(self, duration: float):
+        with self._lock:
+            self.requests += 1
+            self.mock_time += duration
+
+    def report(self, duration: float) -> LoadReport:
+        return LoadReport(
+            calls=len(self.latencies),
+            duration=duration,
+            latencies=self.latencies,
+            max_in_flight=self.max_in_flight,
+            requests=self.requests,
+            mock_time=self.mock_time,
+            errors=self.errors,
+        )
+
+
+class LoadHarness:
+    """
+    Drive concurrent calls to a client function (sending requests to httpx_mock) and measure them.
+    """
+
+    def __init__(self, mock: HTTPXMock):
+        self.mock = mock
+
+    def run_threads(
+        self, call: Callable[[int], Any], calls: int, concurrency: int = 10
+    ) -> LoadReport:
+        """
+        Call the client function, from concurrency threads, until it was called calls times.
+
+        :param call: Client function, sending requests using a synchronous client. Called with the index of the call.
+        :param calls: Total number of calls to the client function.
+        :param concurrency: Number of threads calling the client function at the same time. Default to 10.
+        """
+        measures = _Measures()
+        indexes = iter(range(calls))
+        indexes_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with indexes_lock:
+                    index = next(indexes, None)
+                if index is None:
+                    return
+                measures.call_started()
+                error = None
+                start = time.perf_counter()
+                try:
+                    call(index)
+                except Exception as exception:
+                    error = exception
+                measures.call_ended(time.perf_counter() - start, error)
+
+        with _MockMeasure(self.mock, measures):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                workers = [executor.submit(worker) for _ in range(concurrency)]
+            for finished_worker in workers:
+                finished_worker.result()
+            return measures.report(time.perf_counter() - start)
+
+    async def run_tasks(
+        self, call: Callable[[int], Awaitable[Any]], calls: int, concurrency: int = 10
+    ) -> LoadReport:
+        """
+        Call the client coroutine function, from concurrency tasks, until it was called calls times.
+
+        :param call: Client coroutine function, sending requests using an asynchronous client.
+        Called with the index of the call.
+        :param calls: Total number of calls to the client function.
+        :param concurrency: Number of tasks calling the client function at the same time. Default to 10.
+        """
+        measures = _Measures()
+        # Tasks are running within the same thread, taking the next index cannot be interrupted
+        indexes = iter(range(calls))
+
+        async def worker():
+            for index in indexes:
+                measures.call_started()
+                error = None
+                start = time.perf_counter()
+                try:
+                    await call(index)
+                except Exception as exception:
+                    error = exception
+                measures.call_ended(time.perf_counter() - start, error)
+
+        with _MockMeasure(self.mock, measures):
+            start = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+            return measures.report(time.perf_counter() - start)
+
+
+class _MockMeasure:
+    """
+    Time spent by the mock handling requests, only measured while a load run is in progress.
+
+    Mock methods are wrapped for the duration of the run so that requests sent outside of it are not slowed down.
+    """
+
+    def __init__(self, mock: HTTPXMock, measures: _Measures):
+        self._mock = mock
+        self._measures = measures
+
+    def __enter__(self):
+        handle_request = self._mock._handle_request
+        handle_async_request = self._mock._handle_async_request
+        measures = self._measures
+
+        @functools.wraps(handle_request)
+        def measured_handle_request(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return handle_request(*args, **kwargs)
+            finally:
+                measures.request_handled(time.perf_counter() - start)
+
+        @functools.wraps(handle_async_request)
+        async def measured_handle_async_request(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await handle_async_request(*args, **kwargs)
+            finally:
+                measures.request_handled(time.perf_counter() - start)
+
+        self._mock._handle_request = measured_handle_request
+        self._mock._handle_async_request = measured_handle_async_request
+
+    def __exit__(self, *exc_info):
+        del self._mock._handle_request
+        del self._mock._handle_async_request
+
+
+@pytest.fixture
+def httpx_load(httpx_mock: HTTPXMock) -> LoadHarness:
+    return LoadHarness(httpx_mock)
@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+from typing import Any, Callable, Dict, List, Union
+
+# Conversion of CSV cells (always str) to the type expected by HTTPXMock.add_response
+_CSV_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "status_code": int,
+    "chunk_size": int,
+    "bandwidth": int,
+    "latency": float,
+    "headers": json.loads,
+    "json": json.loads,
+    "match_headers": json.loads,
+    "match_json": json.loads,
+}
+
+
+def load_routes(path: Union[str, os.PathLike]) -> List[Dict[str, Any]]:
+    """
+    Load a route table (HTTPXMock.add_response parameters per route) from a JSON, YAML or CSV file.
+
+    File format is guessed from the file extension (.json, .yaml, .yml or .csv).
+    Relative file parameters are relative to the directory of the route table.
+    """
+    extension = os.path.splitext(os.fspath(path))[1].lower()
+    if extension not in (".json", ".yaml", ".yml", ".csv"):
+        raise ValueError(
+            f"{path} is not a JSON (.json), YAML (.yaml, .yml) or CSV (.csv) route table."
+        )
+
+    try:
+        if extension == ".json":
+            with open(path, "r", encoding="utf-8") as table:
+                routes = json.load(table)
+        elif extension == ".csv":
+            with open(path, "r", encoding="utf-8", newline="") as table:
+                routes = [_convert_csv_row(row) for row in csv.DictReader(table)]
+        else:
+            routes = _load_yaml(path)
+    except ValueError as error:
+        raise ValueError(f"{path} is not a valid route table.") from error
+
+    if not isinstance(routes, list) or not all(
+        isinstance(route, dict) for route in routes
+    ):
+        raise ValueError(f"{path} is not a valid route table.")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    for route in routes:
+        # match_content must be bytes, JSON, YAML and CSV only provide str
+        if isinstance(route.get("match_content"), str):
+            route["match_content"] = route["match_content"].encode("utf-8")
+        if route.get("file") is not None:
+            route["file"] = os.path.join(directory, route["file"])
+    return routes
+
+
+def _load_yaml(path: Union[str, os.PathLike]) -> Any:
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError(
+            "PyYAML is required to load YAML route tables, install pytest_httpx[yaml]."
+        )
+
+    with open(path, "r", encoding="utf-8") as table:
+        try:
+            return yaml.safe_load(table)
+        except yaml.YAMLError as error:
+            raise ValueError(str(error)) from error
+
+
+def _convert_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
+    # Cells without a column name (more cells than columns)
+    if None in row:
+        raise ValueError(f"Row {row} has more cells than columns.")
+
+    # Empty cells stand for parameters that are not provided (default value)
+    return {
+        name: _CSV_CONVERTERS.get(name, str)(value)
+        for name, value in row.items()
+        if value
+    }
@@ -0,0 +1,272 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from httpx import Headers, Request, Response, content_streams
+
+# asyncio.current_task was introduced in Python 3.7
+_current_task = (
+    asyncio.current_task
+    if hasattr(asyncio, "current_task")
+    else asyncio.Task.current_task
+)
+
+# Response headers describing the framing of the body, provided by the server according to the body being sent
+_FRAMING_HEADERS = {b"content-length", b"transfer-encoding", b"connection"}
+
+# Maximum size (in bytes) of a request line and headers
+_MAX_HEAD_SIZE = 65_536
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class MockServer:
+    """
+    HTTP/1.1 server, listening on a loopback interface, replying to requests using a mock.
+
+    Server runs its own event loop within a dedicated thread.
+    Connections are kept alive (unless requested otherwise) and pipelined requests are replied to in order.
+    """
+
+    def __init__(self, handle_request: Callable[[Request], Awaitable[Response]]):
+        self._handle_request = handle_request
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._server = None
+        self._connections: Set[asyncio.Task] = set()
+        self.url: Optional[str] = None
+
+    def start(self, host: str, port: int) -> str:
+        """
+        Start listening and return the URL of the server.
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="httpx_mock server", daemon=True
+        )
+        self._thread.start()
+        try:
+            self._server = asyncio.run_coroutine_threadsafe(
+                self._start(host, port), self._loop
+            ).result()
+        except Exception:
+            self._stop_loop()
+            raise
+
+        host, port = self._server.sockets[0].getsockname()[:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def _start(self, host: str, port: int):
+        return await asyncio.start_server(
+            self._serve_connection, host, port, limit=_MAX_HEAD_SIZE
+        )
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._stop_loop()
+
+    async def _stop(self):
+        self._server.close()
+        for connection in self._connections:
+            connection.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _serve_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        connection = _current_task()
+        self._connections.add(connection)
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request, keep_alive = await self._read_request(reader, writer)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    # Connection closed by the client
+                    return
+                except (_BadRequest, asyncio.LimitOverrunError, ValueError):
+                    writer.write(
+                        b"HTTP/1.1 400 Bad Request\r\n"
+                        b"Content-Length: 0\r\nConnection: close\r\n\r\n"
+                    )
+                    return
+
+                if request is None:
+                    return
+
+                try:
+                    response = await self._handle_request(request)
+                except Exception as exception:
+                    response = Response(
+                        500,
+                        http_version="HTTP/1.1",
+                        headers={"Content-Type": "text/plain; charset=utf-8"},
+                        content=str(exception).encode("utf-8"),
+                        request=request,
+                    )
+
+                keep_alive = await self._write_response(
+                    writer, request, response, keep_alive
+                )
+        except asyncio.CancelledError:
+            pass
+        except ConnectionError:
+            # Connection closed by the client while sending the response
+            pass
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> Tuple[Optional[Request], bool]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            # Connection closed in between requests
+            if not error.partial.strip():
+                return None, False
+            raise
+
+        lines = head.lstrip(b"\r\n").split(b"\r\n")
+        try:
+            method, target, version = lines[0].split(b" ")
+        except ValueError:
+            raise _BadRequest()
+
+        headers: List[Tuple[bytes, bytes]] = []
+        for line in lines[1:-2]:
+            name, separator, value = line.partition(b":")
+            if not separator:
+                raise _BadRequest()
+            headers.append((name.strip(), value.strip()))
+
+        lower_headers = {name.lower(): value.lower() for name, value in headers}
+        # Clients waiting for the server approval before sending the body (such as curl for large uploads)
+        if lower_headers.get(b"expect") == b"100-continue" and version == b"HTTP/1.1":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        if b"chunked" in lower_headers.get(b"transfer-encoding", b""):
+            body = await self._read_chunks(reader)
+        else:
+            body = await reader.readexactly(
+                int(lower_headers.get(b"content-length", 0))
+            )
+
+        connection = lower_headers.get(b"connection", b"")
+        if version == b"HTTP/1.0":
+            keep_alive = b"keep-alive" in connection
+        else:
+            keep_alive = b"close" not in connection
+
+        # Absolute target is sent when server is used as a proxy
+        if target.startswith((b"http://", b"https://")):
+            url = target.decode("ascii")
+        else:
+            host = lower_headers.get(b"host") or self.url[len("http://") :].encode()
+            url = f"http://{host.decode('ascii')}{target.decode('ascii')}"
+
+        request = Request(
+            method.decode("ascii"),
+            url,
+            headers=headers,
+            stream=content_streams.ByteStream(body),
+        )
+        # Request preparation adds default headers (User-Agent, Accept, ...), keep the ones that were actually sent
+        request.headers = Headers(headers)
+        return request, keep_alive
+
+    async def _read_chunks(self, reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            # Chunk extensions are ignored
+            size = int(size_line.split(b";", 1)[0], 16)
+            if not size:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+        # Trailers are ignored
+        while await reader.readuntil(b"\r\n") != b"\r\n":
+            pass
+        return b"".join(chunks)
+
+    async def _write_response(
+        self,
+        writer: asyncio.StreamWriter,
+        request: Request,
+        response: Response,
+        keep_alive: bool,
+    ) -> bool:
+        """
+        Send the response and return True if the connection can be kept alive.
+        """
+        stream = response._raw_stream
+        headers = [
+            (name, value)
+            for name, value in response.headers.raw
+            if name.lower() not in _FRAMING_HEADERS
+        ]
+        has_body = (
+            request.method != "HEAD"
+            and response.status_code >= 200
+            and response.status_code not in (204, 304)
+        )
+        chunked = False
+        if isinstance(stream, content_streams.ByteStream):
+            headers.append((b"Content-Length", str(len(stream.body)).encode()))
+        elif "content-length" in response.headers:
+            headers.append(
+                (b"Content-Length", response.headers["content-length"].encode())
+            )
+        elif has_body:
+            chunked = True
+            headers.append((b"Transfer-Encoding", b"chunked"))
+        if not keep_alive:
+            headers.append((b"Connection", b"close"))
+
+        head = [f"HTTP/1.1 {response.status_code} {response.reason_phrase}".encode()]
+        head.extend(name + b": " + value for name, value in headers)
+        head.append(b"\r\n")
+        writer.write(b"\r\n".join(head))
+
+        if has_body:
+            if isinstance(stream, content_streams.ByteStream):
+                writer.write(stream.body)
+            else:
+                async for chunk in _iterate(stream):
+                    if not chunk:
+                        continue
+                    if chunked:
+                        writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    else:
+                        writer.write(chunk)
+                    await writer.drain()
+                if chunked:
+                    writer.write(b"0\r\n\r\n")
+        if isinstance(stream, content_streams.AsyncIteratorStream):
+            await stream.aclose()
+        else:
+            stream.close()
+
+        await writer.drain()
+        return keep_alive
+
+
+async def _iterate(stream: content_streams.ContentStream):
+    # Synchronous streams (iterators provided to a callback response) cannot be asynchronously iterated
+    if isinstance(stream, content_streams.IteratorStream):
+        for chunk in stream:
+            yield chunk
+    else:
+        async for chunk in stream:
+            yield chunk
@@ -0,0 +1,95 @@
+import collections
+import mmap
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
+
+class SharedFile:
+    """
+    Read-only memory mapping of a file, and what was parsed out of it (cassette index).
+    """
+
+    def __init__(
+        self, key: str, version: Tuple[int, int, int], mapping: Union[mmap.mmap, bytes]
+    ):
+        self.key = key
+        # File modification time, size and inode, a new mapping is required if any of those changed
+        self.version = version
+        self.mapping = mapping
+        # Parsed cassette index (if the file was replayed as a cassette)
+        self.exchanges: Optional[Any] = None
+        # Number of tests currently using this mapping
+        self.users = 0
+
+    def close(self):
+        if isinstance(self.mapping, mmap.mmap):
+            self.mapping.close()
+
+
+class SharedFiles:
+    """
+    Files memory-mapped once per process and shared by every test using them.
+
+    Read-only mappings of the same file share the same physical memory (the operating system page cache),
+    every pytest-xdist worker thus maps the same segment instead of loading its own copy.
+    A mapping (and what was parsed out of it) is reused as long as the file is not modified.
+    Mappings no longer used by any test are kept, up to max_unused files (least recently used are closed first).
+    """
+
+    def __init__(self, max_unused: int = 64):
+        self._max_unused = max_unused
+        self._files: Dict[str, SharedFile] = collections.OrderedDict()
+        # Files may be acquired by several threads at the same time
+        self._lock = threading.Lock()
+
+    def acquire(self, path: Union[str, os.PathLike]) -> SharedFile:
+        """
+        Return the mapping of this file, to be released once not used anymore.
+        """
+        with open(path, "rb") as opened_file:
+            stat = os.fstat(opened_file.fileno())
+            version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            key = os.path.realpath(path)
+            with self._lock:
+                shared_file = self._files.get(key)
+                if not shared_file or shared_file.version != version:
+                    if shared_file and not shared_file.users:
+                        shared_file.close()
+                    shared_file = SharedFile(key, version, self._map(opened_file, stat))
+                    self._files[key] = shared_file
+                self._files.move_to_end(key)
+                shared_file.users += 1
+                return shared_file
+
+    @staticmethod
+    def _map(opened_file, stat: os.stat_result) -> Union[mmap.mmap, bytes]:
+        # Empty files cannot be mapped
+        if not stat.st_size:
+            return b""
+        # Mapping stays valid once file is closed
+        return mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def release(self, shared_file: SharedFile):
+        with self._lock:
+            shared_file.users -= 1
+            if shared_file.users:
+                return
+
+            # File was modified (and mapped again) while this mapping was still in use
+            if self._files.get(shared_file.key) is not shared_file:
+                shared_file.close()
+                return
+
+            unused = [key for key, cached in self._files.items() if not cached.users]
+            for key in unused[: max(len(unused) - self._max_unused, 0)]:
+                self._files.pop(key).close()
+
+    def close(self):
+        """
+        Close every mapping not currently in use.
+        """
+        with self._lock:
+            for key, shared_file in list(self._files.items()):
+                if not shared_file.users:
+                    self._files.pop(key).close()
@@ -0,0 +1,233 @@
+import json
+import threading
+from typing import Dict, List, Tuple, Any, Optional
+
+import pytest
+
+
+class RegistrationStatistics:
+    """
+    Statistics of a registration (response or callback), aggregated for every test registering it at the same place.
+    """
+
+    def __init__(self, kind: str, location: str, registration: str):
+        self.kind = kind
+        self.location = location
+        self.registration = registration
+        # Number of requests sent using this registration
+        self.hits = 0
+        # Number of times this registration was evaluated against a request (once its URL is known to match)
+        self.evaluations = 0
+        # Cumulative time (in seconds) spent evaluating this registration against requests
+        self.matching_time = 0.0
+        # Cumulative time (in seconds) spent executing this callback
+        self.callback_time = 0.0
+        # Registrations may be evaluated by several threads at the same time
+        self._lock = threading.Lock()
+
+    def add_evaluation(self, duration: float):
+        with self._lock:
+            self.evaluations += 1
+            self.matching_time += duration
+
+    def add_callback_execution(self, duration: float):
+        with self._lock:
+            self.callback_time += duration
+
+    def add_hits(self, hits: int):
+        with self._lock:
+            self.hits += hits
+
+    @property
+    def total_time(self) -> float:
+        return self.matching_time + self.callback_time
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "location": self.location,
+            "registration": self.registration,
+            "hits": self.hits,
+            "evaluations": self.evaluations,
+            "matching_time": self.matching_time,
+            "callback_time": self.callback_time,
+        }
+
+    def merge(self, other: Dict[str, Any]):
+        with self._lock:
+            self.hits += other["hits"]
+            self.evaluations += other["evaluations"]
+            self.matching_time += other["matching_time"]
+            self.callback_time += other["callback_time"]
+
+
+class SessionStatistics:
+    """
+    Statistics of every registration performed and every request sent during a test session.
+    """
+
+    def __init__(self):
+        self._registrations: Dict[Tuple[str, str, str], RegistrationStatistics] = {}
+        # Number of requests sent and number of those without matching mock, per method and URL
+        self._requests: Dict[Tuple[str, str], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def registration(
+        self, kind: str, location: str, registration: str
+    ) -> RegistrationStatistics:
+        key = kind, location, registration
+        with self._lock:
+            statistics = self._registrations.get(key)
+            if not statistics:
+                statistics = RegistrationStatistics(kind, location, registration)
+                self._registrations[key] = statistics
+            return statistics
+
+    def add_request(self, method: str, url: str):
+        with self._lock:
+            self._requests.setdefault((method, url), [0, 0])[0] += 1
+
+    def add_unmatched_request(self, method: str, url: str):
+        with self._lock:
+            self._requests.setdefault((method, url), [0, 0])[1] += 1
+
+    def merge(self, other: Dict[str, Any]):
+        """
+        Aggregate statistics collected by another process (a pytest-xdist worker).
+        """
+        for registration in other["registrations"]:
+            self.registration(
+                registration["kind"],
+                registration["location"],
+                registration["registration"],
+            ).merge(registration)
+        with self._lock:
+            for request in other["requests"]:
+                counts = self._requests.setdefault(
+                    (request["method"], request["url"]), [0, 0]
+                )
+                counts[0] += request["count"]
+                counts[1] += request["unmatched"]
+
+    def to_json(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = [
+                {
+                    "method": method,
+                    "url": url,
+                    "count": count,
+                    "unmatched": unmatched,
+                }
+                for (method, url), (count, unmatched) in self._requests.items()
+            ]
+        return {
+            "registrations": [
+                statistics.to_json() for statistics in self.most_expensive()
+            ],
+            "requests": requests,
+        }
+
+    def requests_summary(self) -> str:
+        with self._lock:
+            nb_requests = sum(count for count, _ in self._requests.values())
+            nb_unmatched = sum(unmatched for _, unmatched in self._requests.values())
+            nb_distinct = len(self._requests)
+        return (
+            f"{nb_requests} requests sent on {nb_distinct} distinct method and URL, "
+            f"{nb_unmatched} without matching mock."
+        )
+
+    def most_expensive(self, top: int = None) -> List[RegistrationStatistics]:
+        """
+        Return registrations sorted by cumulative time spent matching and inside callbacks (highest first).
+        """
+        with self._lock:
+            registrations = sorted(
+                self._registrations.values(),
+                key=lambda statistics: (statistics.total_time, statistics.hits),
+                reverse=True,
+            )
+        return registrations[:top] if top else registrations
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("httpx", "httpx mock")
+    group.addoption(
+        "--httpx-stats",
+        action="store_true",
+        default=False,
+        help="Collect hits and timings of every httpx_mock response and callback, "
+        "and report the most expensive ones in terminal summary.",
+    )
+    group.addoption(
+        "--httpx-stats-top",
+        type=int,
+        default=10,
+        help="Number of httpx_mock registrations reported in terminal summary. Default to 10.",
+    )
+    group.addoption(
+        "--httpx-stats-json",
+        default=None,
+        help="Path to a file where statistics of every httpx_mock registration will be exported (as JSON).",
+    )
+
+
+def pytest_configure(config):
+    config._httpx_mock_statistics = (
+        SessionStatistics()
+        if config.getoption("httpx_stats") or config.getoption("httpx_stats_json")
+        else None
+    )
+
+
+def session_statistics(config) -> Optional[SessionStatistics]:
+    return getattr(config, "_httpx_mock_statistics", None)
+
+
+def pytest_sessionfinish(session):
+    statistics = session_statistics(session.config)
+    if not statistics:
+        return
+
+    # Statistics collected by a pytest-xdist worker are sent back to the controller
+    workeroutput = getattr(session.config, "workeroutput", None)
+    if workeroutput is not None:
+        workeroutput["httpx_mock_statistics"] = statistics.to_json()
+        return
+
+    path = session.config.getoption("httpx_stats_json")
+    if path:
+        with open(path, "w") as export:
+            json.dump(statistics.to_json(), export, indent=4)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    statistics = session_statistics(node.config)
+    if statistics:
+        worker_statistics = node.workeroutput.get("httpx_mock_statistics")
+        if worker_statistics:
+            statistics.merge(worker_statistics)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    statistics = session_statistics(config)
+    if not statistics or not config.getoption("httpx_stats"):
+        return
+
+    registrations = statistics.most_expensive(config.getoption("httpx_stats_top"))
+    terminalreporter.write_sep("=", "httpx mock statistics")
+    terminalreporter.write_line(statistics.requests_summary())
+    if not registrations:
+        terminalreporter.write_line("No httpx_mock registration.")
+        return
+
+    terminalreporter.write_line(
+        f"{'Hits':>8} {'Evaluations':>12} {'Matching (s)':>13} {'Callback (s)':>13}  Registration"
+    )
+    for registration in registrations:
+        terminalreporter.write_line(
+            f"{registration.hits:>8} {registration.evaluations:>12} {registration.matching_time:>13.6f} "
+            f"{registration.callback_time:>13.6f}  {registration.kind} {registration.registration} "
+            f"({registration.location})"
+        )
@@ -42,9 +42,15 @@ setup(
             "pytest-asyncio==0.10.*",
             # Used to check coverage
             "pytest-cov==2.*",
-        ]
+            # Used to load YAML route tables
+            "PyYAML==5.*",
+        ],
+        # Used to load YAML route tables
+        "yaml": ["PyYAML==5.*"],
     },
     python_requires=">=3.6",
+    # Register pytest hooks (command line options and terminal summary)
+    entry_points={"pytest11": ["pytest_httpx = pytest_httpx"]},
     project_urls={
         "GitHub": "https://github.com/Colin-b/pytest_httpx",
         "Changelog": "https://github.com/Colin-b/pytest_httpx/blob/master/CHANGELOG.md",
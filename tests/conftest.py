@@ -0,0 +1,2 @@
+# Plugin is registered using an entry point once installed
+pytest_plugins = ["pytest_httpx", "pytester"]
@@ -0,0 +1,191 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+import httpx
+
+from pytest_httpx import httpx_mock, HTTPXMock
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    received = []
+
+    def do_GET(self):
+        self.received.append(("GET", self.path))
+        if self.path == "/gzip":
+            body = gzip.compress(b"compressed content")
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+        else:
+            body = f"GET {self.path}".encode()
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "a=1")
+        self.send_header("Set-Cookie", "b=2")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        body = self.rfile.read(length)
+        self.received.append(("POST", self.path))
+        self.send_response(201)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    _Handler.received = []
+    server = _ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_record_and_replay(httpx_mock: HTTPXMock, server_url: str, tmp_path):
+    cassette = tmp_path / "test.cassette"
+    httpx_mock.record_cassette(cassette)
+    httpx_mock.add_response(url=f"{server_url}/mocked", data=b"mocked content")
+
+    with httpx.Client() as client:
+        assert client.get(f"{server_url}/mocked").content == b"mocked content"
+        response = client.get(f"{server_url}/first")
+        assert response.content == b"GET /first"
+        assert response.headers.getlist("set-cookie") == ["a=1", "b=2"]
+        response = client.post(f"{server_url}/second", data=b"sent content")
+        assert response.status_code == 201
+        assert response.content == b"sent content"
+        assert client.get(f"{server_url}/gzip").content == b"compressed content"
+
+    assert _Handler.received == [
+        ("GET", "/first"),
+        ("POST", "/second"),
+        ("GET", "/gzip"),
+    ]
+    httpx_mock.assert_and_reset()
+
+    httpx_mock.replay_cassette(cassette)
+
+    with httpx.Client() as client:
+        response = client.get(f"{server_url}/first")
+        assert response.content == b"GET /first"
+        assert response.headers.getlist("set-cookie") == ["a=1", "b=2"]
+        response = client.post(f"{server_url}/second")
+        assert response.status_code == 201
+        assert response.content == b"sent content"
+        assert client.get(f"{server_url}/gzip").content == b"compressed content"
+
+        with pytest.raises(httpx.HTTPError):
+            client.get(f"{server_url}/mocked")
+
+    # Replayed responses are not sent by the server
+    assert len(_Handler.received) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_record_and_replay(
+    httpx_mock: HTTPXMock, server_url: str, tmp_path
+):
+    cassette = tmp_path / "test.cassette"
+    httpx_mock.record_cassette(cassette)
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get(f"{server_url}/first")
+        assert response.content == b"GET /first"
+        response = await client.post(f"{server_url}/second", data=b"sent content")
+        assert response.content == b"sent content"
+        response = await client.get(f"{server_url}/gzip")
+        assert response.content == b"compressed content"
+
+    httpx_mock.assert_and_reset()
+    httpx_mock.replay_cassette(cassette)
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get(f"{server_url}/first")
+        assert response.content == b"GET /first"
+        response = await client.post(f"{server_url}/second")
+        assert response.status_code == 201
+        assert response.content == b"sent content"
+        response = await client.get(f"{server_url}/gzip")
+        assert response.content == b"compressed content"
+
+    assert len(_Handler.received) == 3
+
+
+def test_replay_same_url_in_recorded_order(
+    httpx_mock: HTTPXMock, server_url: str, tmp_path
+):
+    cassette = tmp_path / "test.cassette"
+    httpx_mock.record_cassette(cassette)
+
+    with httpx.Client() as client:
+        client.post(f"{server_url}/echo", data=b"1")
+        client.post(f"{server_url}/echo", data=b"2")
+
+    httpx_mock.assert_and_reset()
+    httpx_mock.replay_cassette(cassette)
+
+    with httpx.Client() as client:
+        assert client.post(f"{server_url}/echo").content == b"1"
+        assert client.post(f"{server_url}/echo").content == b"2"
+        assert client.post(f"{server_url}/echo").content == b"2"
+
+
+def test_replay_many_exchanges(httpx_mock: HTTPXMock, tmp_path):
+    cassette = tmp_path / "test.cassette"
+    httpx_mock.record_cassette(cassette)
+    # Simulate recorded exchanges without an actual server
+    for index in range(10_000):
+        request = httpx.Request("GET", f"http://test_url/{index}")
+        response = httpx.Response(200, http_version="HTTP/1.1", request=request)
+        httpx_mock._recorder.record(request, response, f"content {index}".encode())
+    httpx_mock.assert_and_reset()
+
+    httpx_mock.replay_cassette(cassette)
+
+    with httpx.Client() as client:
+        for index in range(10_000):
+            response = client.get(f"http://test_url/{index}")
+            assert response.content == f"content {index}".encode()
+
+
+def test_invalid_cassette(httpx_mock: HTTPXMock, tmp_path):
+    cassette = tmp_path / "test.cassette"
+    cassette.write_bytes(b"not a cassette\n")
+
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.replay_cassette(cassette)
+    assert str(exception_info.value) == f"{cassette} is not a valid cassette file."
+
+
+def test_cassette_parsed_once(httpx_mock: HTTPXMock, tmp_path):
+    cassette = tmp_path / "test.cassette"
+    httpx_mock.record_cassette(cassette)
+    request = httpx.Request("GET", "http://test_url")
+    response = httpx.Response(200, http_version="HTTP/1.1", request=request)
+    httpx_mock._recorder.record(request, response, b"content")
+    httpx_mock.assert_and_reset()
+
+    httpx_mock.replay_cassette(cassette)
+    first_file = httpx_mock._shared_files[0]
+    with httpx.Client() as client:
+        assert client.get("http://test_url").content == b"content"
+    httpx_mock.assert_and_reset()
+
+    httpx_mock.replay_cassette(cassette)
+    assert httpx_mock._shared_files[0] is first_file
+    with httpx.Client() as client:
+        assert client.get("http://test_url").content == b"content"
@@ -1,4 +1,8 @@
+import asyncio
+import json
 import re
+import threading
+import time
 from typing import Optional
 
 import pytest
@@ -43,6 +47,21 @@ async def test_url_matching(httpx_mock: HTTPXMock):
         assert response.content == b""
 
 
+@pytest.mark.asyncio
+async def test_url_normalization(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="HTTP://TEST_URL/a/../b c?d=é", data=b"normalized")
+    httpx_mock.add_response(
+        url="http://test_url/b%20c?d=%C3%A9", data=b"already normalized"
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url/b c?d=é")
+        assert response.content == b"normalized"
+
+        response = await client.get("http://Test_Url/a/../b%20c?d=%C3%A9")
+        assert response.content == b"already normalized"
+
+
 @pytest.mark.asyncio
 async def test_method_matching(httpx_mock: HTTPXMock):
     httpx_mock.add_response(method="get")
@@ -706,7 +725,11 @@ async def test_headers_not_matching(httpx_mock: HTTPXMock):
             await client.get("http://test_url")
         assert (
             str(exception_info.value)
-            == "No mock can be found for GET request on http://test_url."
+            == """No mock can be found for GET request on http://test_url.
+Closest registrations (1 out of 1):
+ * <Response [200 OK]> on any method on any URL with headers {'user-agent': 'python-httpx/0.11.1', 'host': 'test_url2', 'host2': 'test_url'}
+   - header host: expected 'test_url2' but received 'test_url'
+   - header host2: expected 'test_url' but received nothing"""
         )
 
     # Clean up responses to avoid assertion failure
@@ -731,8 +754,761 @@ async def test_content_not_matching(httpx_mock: HTTPXMock):
             await client.post("http://test_url", data=b"This is the body2")
         assert (
             str(exception_info.value)
-            == "No mock can be found for POST request on http://test_url."
+            == """No mock can be found for POST request on http://test_url.
+Closest registrations (1 out of 1):
+ * <Response [200 OK]> on any method on any URL with content
+   - content: expected b'This is the body' but received b'This is the body2'"""
+        )
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+@pytest.mark.asyncio
+async def test_response_selection_order_with_exact_and_pattern_urls(
+    httpx_mock: HTTPXMock,
+):
+    httpx_mock.add_response(url=re.compile(".*test.*"), data=b"test content 1")
+    httpx_mock.add_response(url="http://test_url", data=b"test content 2")
+    httpx_mock.add_response(method="GET", data=b"test content 3")
+    httpx_mock.add_response(
+        url=httpx.URL("http://test_url"), method="GET", data=b"test content 4"
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url")
+        assert response.content == b"test content 1"
+
+        response = await client.get("http://test_url")
+        assert response.content == b"test content 2"
+
+        response = await client.get("http://test_url")
+        assert response.content == b"test content 3"
+
+        response = await client.get("http://test_url")
+        assert response.content == b"test content 4"
+
+        response = await client.get("http://test_url")
+        assert response.content == b"test content 4"
+
+        response = await client.post("http://test_url")
+        assert response.content == b"test content 2"
+
+
+@pytest.mark.asyncio
+async def test_with_many_exact_urls(httpx_mock: HTTPXMock):
+    for index in range(1000):
+        httpx_mock.add_response(
+            url=f"http://test_url/{index}", data=f"test content {index}".encode()
+        )
+
+    async with httpx.AsyncClient() as client:
+        for index in range(1000):
+            response = await client.get(f"http://test_url/{index}")
+            assert response.content == f"test content {index}".encode()
+
+
+@pytest.mark.asyncio
+async def test_with_many_patterns_in_url(httpx_mock: HTTPXMock):
+    for index in range(100):
+        httpx_mock.add_response(
+            url=re.compile(f"http://test_url/{index}$"),
+            data=f"test content {index}".encode(),
+        )
+    httpx_mock.add_response(url=re.compile(".*/1.*"), data=b"test content fallback")
+
+    async with httpx.AsyncClient() as client:
+        for index in range(100):
+            response = await client.get(f"http://test_url/{index}")
+            assert response.content == f"test content {index}".encode()
+
+        response = await client.get("http://test_url/1")
+        assert response.content == b"test content fallback"
+
+        response = await client.get("http://test_url/1")
+        assert response.content == b"test content fallback"
+
+
+@pytest.mark.asyncio
+async def test_patterns_in_url_with_flags_and_groups(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url=re.compile("HTTP://TEST_URL/(a+)", re.IGNORECASE), data=b"test content 1"
+    )
+    httpx_mock.add_response(
+        url=re.compile(r"http://test_url/(b)\1"), data=b"test content 2"
+    )
+    httpx_mock.add_response(
+        url=re.compile("http://test_url/(?P<name>c)"), data=b"test content 3"
+    )
+    httpx_mock.add_response(
+        url=re.compile("(?i)HTTP://TEST_URL/D"), data=b"test content 4"
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url/aa")
+        assert response.content == b"test content 1"
+
+        response = await client.get("http://test_url/bb")
+        assert response.content == b"test content 2"
+
+        response = await client.get("http://test_url/c")
+        assert response.content == b"test content 3"
+
+        response = await client.get("http://test_url/d")
+        assert response.content == b"test content 4"
+
+        with pytest.raises(httpx.HTTPError):
+            await client.get("http://test_url/b")
+
+
+@pytest.mark.asyncio
+async def test_headers_matching_is_case_insensitive(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        match_headers={"User-Agent": "python-httpx/0.11.1", "X-TEST": "1, 2"}
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get(
+            "http://test_url", headers=[("x-test", "1"), ("X-Test", "2")]
+        )
+        assert response.content == b""
+
+
+@pytest.mark.asyncio
+async def test_headers_matching_multiple_values(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(match_headers={"X-Test": ["1", "2"]}, data=b"list")
+    httpx_mock.add_response(match_headers={"X-Test": "1, 2"}, data=b"joined")
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url", headers={"X-Test": "1, 2"})
+        assert response.content == b"joined"
+        # Client would merge repeated headers into a single one
+        response = await client.send(
+            httpx.Request(
+                "GET", "http://test_url", headers=[("X-Test", "1"), ("X-Test", "2")]
+            )
+        )
+        assert response.content == b"list"
+        # Order of values matters
+        with pytest.raises(httpx.HTTPError):
+            await client.send(
+                httpx.Request(
+                    "GET", "http://test_url", headers=[("X-Test", "2"), ("X-Test", "1")]
+                )
+            )
+
+
+@pytest.mark.asyncio
+async def test_headers_matching_regex(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(match_headers={"Authorization": re.compile(r"Bearer \w+$")})
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get(
+            "http://test_url", headers={"Authorization": "Bearer token"}
+        )
+        assert response.content == b""
+
+        with pytest.raises(httpx.HTTPError):
+            await client.get(
+                "http://test_url", headers={"Authorization": "Basic token"}
+            )
+        with pytest.raises(httpx.HTTPError):
+            await client.get("http://test_url")
+
+
+@pytest.mark.asyncio
+async def test_headers_matching_presence(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        match_headers={"X-Present": True, "X-Absent": False}, data=b"matched"
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url", headers={"X-Present": ""})
+        assert response.content == b"matched"
+
+        with pytest.raises(httpx.HTTPError):
+            await client.get("http://test_url")
+        with pytest.raises(httpx.HTTPError):
+            await client.get(
+                "http://test_url", headers={"X-Present": "1", "X-Absent": "1"}
+            )
+
+    assert len(httpx_mock.get_requests(match_headers={"x-absent": True})) == 1
+    assert len(httpx_mock.get_requests(match_headers={"x-present": True})) == 2
+
+
+@pytest.mark.asyncio
+async def test_json_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="http://test_url", match_json={"a": 1, "b": [1, {"c": None}]}
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            "http://test_url", json={"b": [1, {"c": None}], "a": 1}
+        )
+        assert response.content == b""
+        response = await client.post(
+            "http://test_url", data=b'{ "b" : [1,{"c":null}],\n "a": 1 }'
+        )
+        assert response.content == b""
+
+        with pytest.raises(httpx.HTTPError):
+            await client.post("http://test_url", json={"a": 1, "b": [{"c": None}, 1]})
+        with pytest.raises(httpx.HTTPError):
+            await client.post("http://test_url", data=b"not json")
+        with pytest.raises(httpx.HTTPError):
+            await client.post(
+                "http://test_url/other", json={"a": 1, "b": [1, {"c": None}]}
+            )
+
+    assert len(httpx_mock.get_requests(match_json={"a": 1, "b": [1, {"c": None}]})) == 3
+
+
+@pytest.mark.asyncio
+async def test_json_matching_amongst_many(httpx_mock: HTTPXMock):
+    for index in range(1_000):
+        httpx_mock.add_response(
+            url="http://test_url",
+            method="POST",
+            match_json={"index": index},
+            data=f"exact {index}".encode(),
+        )
+    httpx_mock.add_response(
+        url=re.compile("http://test_url/.*"),
+        match_json={"index": 0},
+        data=b"regex",
+    )
+    httpx_mock.add_response(match_json={"index": 1}, data=b"any url")
+
+    async with httpx.AsyncClient() as client:
+        for index in reversed(range(1_000)):
+            response = await client.post("http://test_url", json={"index": index})
+            assert response.content == f"exact {index}".encode()
+        response = await client.post("http://test_url/path", json={"index": 0})
+        assert response.content == b"regex"
+        response = await client.post("http://other_url", json={"index": 1})
+        assert response.content == b"any url"
+
+
+@pytest.mark.asyncio
+async def test_content_matching_on_streamed_body(httpx_mock: HTTPXMock):
+    for index in range(10):
+        httpx_mock.add_response(
+            match_content=f"body {index}".encode(), data=f"content {index}".encode()
+        )
+
+    async def stream():
+        yield b"body "
+        yield b"9"
+
+    async with httpx.AsyncClient() as client:
+        response = await client.post("http://test_url", data=stream())
+        assert response.content == b"content 9"
+
+    assert httpx_mock.get_request(match_content=b"body 9").read() == b"body 9"
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+@pytest.mark.asyncio
+async def test_async_callback_returning_response(httpx_mock: HTTPXMock):
+    async def custom_response(
+        request: httpx.Request, timeout: Optional[httpx.Timeout], *args, **kwargs
+    ) -> httpx.Response:
+        await asyncio.sleep(0)
+        return httpx.Response(
+            status_code=200,
+            http_version="HTTP/1.1",
+            headers=[],
+            stream=content_streams.JSONStream({"url": str(request.url)}),
+            request=request,
+        )
+
+    httpx_mock.add_callback(custom_response, url="http://test_url")
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url")
+        assert response.json() == {"url": "http://test_url"}
+
+
+@pytest.mark.asyncio
+async def test_async_callbacks_executed_concurrently(httpx_mock: HTTPXMock):
+    first_received = asyncio.Event()
+
+    async def first_response(request: httpx.Request, *args, **kwargs):
+        first_received.set()
+        return httpx.Response(
+            status_code=200, http_version="HTTP/1.1", content=b"1", request=request
+        )
+
+    async def second_response(request: httpx.Request, *args, **kwargs):
+        # Would wait forever if callbacks were not executed concurrently
+        await asyncio.wait_for(first_received.wait(), timeout=5)
+        return httpx.Response(
+            status_code=200, http_version="HTTP/1.1", content=b"2", request=request
+        )
+
+    httpx_mock.add_callback(first_response, url="http://test_url1")
+    httpx_mock.add_callback(second_response, url="http://test_url2")
+
+    async with httpx.AsyncClient() as client:
+        response2, response1 = await asyncio.gather(
+            client.get("http://test_url2"), client.get("http://test_url1")
+        )
+        assert response1.content == b"1"
+        assert response2.content == b"2"
+
+
+@pytest.mark.asyncio
+async def test_sync_callbacks_executed_in_executor(httpx_mock: HTTPXMock):
+    # Would time out if callbacks were blocking the event loop
+    barrier = threading.Barrier(2, timeout=5)
+
+    def custom_response(request: httpx.Request, *args, **kwargs):
+        barrier.wait()
+        return httpx.Response(
+            status_code=200,
+            http_version="HTTP/1.1",
+            content=str(request.url).encode(),
+            request=request,
+        )
+
+    httpx_mock.add_callback(custom_response, run_in_executor=True)
+
+    async with httpx.AsyncClient() as client:
+        response1, response2 = await asyncio.gather(
+            client.get("http://test_url1"), client.get("http://test_url2")
+        )
+        assert response1.content == b"http://test_url1"
+        assert response2.content == b"http://test_url2"
+
+
+@pytest.mark.asyncio
+async def test_response_streamed_many_times(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url", data=b"test content")
+
+    async with httpx.AsyncClient() as client:
+        async with client.stream("GET", "http://test_url") as response1:
+            assert b"".join([part async for part in response1.aiter_bytes()]) == (
+                b"test content"
+            )
+
+        async with client.stream("GET", "http://test_url") as response2:
+            assert b"".join([part async for part in response2.aiter_bytes()]) == (
+                b"test content"
+            )
+
+    assert response1 is not response2
+    assert response1.request is not response2.request
+
+
+@pytest.mark.asyncio
+async def test_async_iterator_response_sent_many_times(httpx_mock: HTTPXMock):
+    async def stream():
+        yield b"test content 1"
+        await asyncio.sleep(0)
+        yield b"test content 2"
+
+    httpx_mock.add_response(url="http://test_url", data=stream())
+
+    async with httpx.AsyncClient() as client:
+        responses = await asyncio.gather(
+            client.get("http://test_url"), client.get("http://test_url")
+        )
+        for response in responses:
+            assert response.content == b"test content 1test content 2"
+
+        response = await client.get("http://test_url")
+        assert response.content == b"test content 1test content 2"
+
+
+@pytest.mark.asyncio
+async def test_file_response(httpx_mock: HTTPXMock, tmp_path):
+    file_path = tmp_path / "body.bin"
+    file_path.write_bytes(b"0123456789" * 1000)
+    httpx_mock.add_response(url="http://test_url", file=file_path, chunk_size=1000)
+    httpx_mock.add_response(url="http://test_url2", file=str(file_path))
+
+    async with httpx.AsyncClient() as client:
+        async with client.stream("GET", "http://test_url") as response:
+            chunks = [chunk async for chunk in response.aiter_raw()]
+        assert len(chunks) == 10
+        assert b"".join(chunks) == b"0123456789" * 1000
+
+        response = await client.get("http://test_url")
+        assert response.content == b"0123456789" * 1000
+
+        response = await client.get("http://test_url2")
+        assert response.content == b"0123456789" * 1000
+
+
+@pytest.mark.asyncio
+async def test_response_latency_on_one_url(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://slow_url", latency=0.5, data=b"slow")
+    httpx_mock.add_response(url="http://fast_url", data=b"fast")
+
+    received = []
+
+    async def send(client: httpx.AsyncClient, url: str):
+        received.append((await client.get(url)).content)
+
+    async with httpx.AsyncClient() as client:
+        start = time.monotonic()
+        await asyncio.gather(
+            send(client, "http://slow_url"),
+            send(client, "http://fast_url"),
+            send(client, "http://fast_url"),
+        )
+        assert time.monotonic() - start >= 0.5
+
+    assert received == [b"fast", b"fast", b"slow"]
+
+
+@pytest.mark.asyncio
+async def test_callback_latency(httpx_mock: HTTPXMock):
+    async def custom_response(request: httpx.Request, *args, **kwargs):
+        return httpx.Response(
+            status_code=200, http_version="HTTP/1.1", content=b"", request=request
+        )
+
+    httpx_mock.add_callback(custom_response, latency=lambda: 0.2)
+
+    async with httpx.AsyncClient() as client:
+        start = time.monotonic()
+        await client.get("http://test_url")
+        assert time.monotonic() - start >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_response_bandwidth(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url", data=b"a" * 2000, bandwidth=10_000)
+
+    async with httpx.AsyncClient() as client:
+        start = time.monotonic()
+        async with client.stream("GET", "http://test_url") as response:
+            chunks = [chunk async for chunk in response.aiter_raw()]
+        assert time.monotonic() - start >= 0.2
+        assert chunks == [b"a" * 500] * 4
+
+
+@pytest.mark.asyncio
+async def test_requests_retention_last(httpx_mock: HTTPXMock):
+    httpx_mock.retain_requests("last", max_requests=3)
+    httpx_mock.add_response()
+
+    async with httpx.AsyncClient() as client:
+        for index in range(10):
+            await client.get(f"http://test_url/{index}")
+
+    assert [str(request.url) for request in httpx_mock.get_requests()] == [
+        "http://test_url/7",
+        "http://test_url/8",
+        "http://test_url/9",
+    ]
+    assert httpx_mock.nb_requests == 10
+
+
+@pytest.mark.asyncio
+async def test_requests_retention_metadata(httpx_mock: HTTPXMock):
+    httpx_mock.retain_requests("metadata")
+    httpx_mock.add_response()
+
+    async with httpx.AsyncClient() as client:
+        await client.post(
+            "http://test_url", data=b"sent content", headers={"X-Test": "1"}
+        )
+
+    request = httpx_mock.get_request(method="POST", url="http://test_url")
+    assert request.headers["x-test"] == "1"
+    assert request.read() == b""
+    assert httpx_mock.nb_requests == 1
+
+
+@pytest.mark.asyncio
+async def test_closest_registrations_reported(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url", method="PUT")
+    httpx_mock.add_response(url="http://test_url2", match_headers={"X-Test": True})
+    httpx_mock.add_response(url="http://test_url", match_json={"a": 1})
+    httpx_mock.add_response(url=re.compile(".*other.*"), method="PUT")
+
+    async with httpx.AsyncClient() as client:
+        with pytest.raises(httpx.HTTPError) as exception_info:
+            await client.post("http://test_url", json={"a": 2})
+        assert (
+            str(exception_info.value)
+            == """No mock can be found for POST request on http://test_url.
+Closest registrations (3 out of 4):
+ * <Response [200 OK]> on PUT on http://test_url
+   - method: expected PUT but received POST
+ * <Response [200 OK]> on any method on http://test_url with JSON {"a":1}
+   - JSON: expected '{"a":1}' but received '{"a":2}'
+ * <Response [200 OK]> on any method on http://test_url2 with headers {'X-Test': True}
+   - URL: expected http://test_url2 but received http://test_url
+   - header x-test: expected to be sent"""
         )
 
     # Clean up responses to avoid assertion failure
     httpx_mock._responses.clear()
+
+
+@pytest.mark.asyncio
+async def test_add_responses(httpx_mock: HTTPXMock):
+    httpx_mock.add_responses(
+        {"url": f"http://test_url/{index}", "json": {"index": index}}
+        for index in range(1_000)
+    )
+    httpx_mock.add_responses(
+        [{"url": "http://test_url/0", "method": "POST", "status_code": 201}]
+    )
+
+    async with httpx.AsyncClient() as client:
+        for index in range(1_000):
+            response = await client.get(f"http://test_url/{index}")
+            assert response.json() == {"index": index}
+        response = await client.post("http://test_url/0")
+        assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_add_responses_body_encoded_upon_first_request(httpx_mock: HTTPXMock):
+    httpx_mock.add_responses(
+        [
+            {"url": "http://test_url", "json": {"key": "value"}},
+            {"url": "http://test_url2", "data": "not requested"},
+        ]
+    )
+    (_, requested), (_, not_requested) = httpx_mock._responses
+    assert requested._body is None
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url")
+        assert response.json() == {"key": "value"}
+        response = await client.get("http://test_url")
+        assert response.json() == {"key": "value"}
+
+    assert requested._body == b'{"key": "value"}'
+    assert not_requested._body is None
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+@pytest.mark.asyncio
+async def test_url_template_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url_template="http://test_url/users/{user_id}/orders/{order_id}",
+        data=b"order",
+    )
+    httpx_mock.add_response(
+        url_template="http://test_url/users/{user_id}", data=b"user"
+    )
+    httpx_mock.add_response(url_template="http://test_url/users/me", data=b"me")
+    httpx_mock.add_response(
+        url_template="http://test_url/users/{user_id}?page=2", data=b"page 2"
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url/users/1/orders/a%20b")
+        assert response.content == b"order"
+        response = await client.get("http://test_url/users/2")
+        assert response.content == b"user"
+        # Both URL templates match, the first one (user) was already sent
+        response = await client.get("http://test_url/users/me")
+        assert response.content == b"me"
+        response = await client.get("http://test_url/users/3?page=2")
+        assert response.content == b"page 2"
+
+    assert len(httpx_mock.get_requests(url_template="http://test_url/users/{id}")) == 2
+
+
+@pytest.mark.asyncio
+async def test_url_template_not_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url_template="http://test_url/users/{user_id}")
+
+    async with httpx.AsyncClient() as client:
+        for url in (
+            "http://test_url/users",
+            "http://test_url/users/",
+            "http://test_url/users/1/orders",
+            "http://test_url/users/1?page=2",
+            "http://test_url2/users/1",
+            "https://test_url/users/1",
+        ):
+            with pytest.raises(httpx.HTTPError) as exception_info:
+                await client.get(url)
+            assert str(exception_info.value).startswith(
+                f"No mock can be found for GET request on {url}.\n"
+            )
+            assert (
+                f"   - URL: {url} does not match http://test_url/users/{{user_id}}"
+                in str(exception_info.value)
+            )
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+@pytest.mark.asyncio
+async def test_url_template_callback(httpx_mock: HTTPXMock):
+    def custom_response(request: httpx.Request, timeout, url_params):
+        return httpx.Response(
+            200, content=json.dumps(url_params).encode(), request=request
+        )
+
+    httpx_mock.add_callback(
+        custom_response,
+        url_template="http://test_url/users/{user_id}/orders/{order_id}",
+        method="GET",
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url/users/1/orders/a%2Fb")
+        assert response.json() == {"user_id": "1", "order_id": "a/b"}
+
+
+@pytest.mark.asyncio
+async def test_url_template_async_callback(httpx_mock: HTTPXMock):
+    async def custom_response(request: httpx.Request, timeout, url_params):
+        return httpx.Response(
+            200, content=json.dumps(url_params).encode(), request=request
+        )
+
+    httpx_mock.add_callback(
+        custom_response, url_template="http://test_url/users/{user_id}"
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url/users/1")
+        assert response.json() == {"user_id": "1"}
+
+
+@pytest.mark.asyncio
+async def test_params_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="http://test_url/path?b=2",
+        match_params={"a": "1", "c": ["3", "4"]},
+        data=b"exact URL",
+    )
+    httpx_mock.add_response(
+        url=re.compile(".*/regex.*"), match_params={"a": "1"}, data=b"regex"
+    )
+    httpx_mock.add_response(
+        url_template="http://test_url/users/{user_id}?b=2",
+        match_params={"a": "1"},
+        data=b"template",
+    )
+    httpx_mock.add_response(match_params={"a": "1 2"}, data=b"any URL")
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url/path?c=4&a=1&b=2&c=3")
+        assert response.content == b"exact URL"
+        response = await client.get(
+            "http://test_url/path", params={"a": 1, "b": 2, "c": [3, 4]}
+        )
+        assert response.content == b"exact URL"
+        response = await client.get("http://test_url/regex?a=1")
+        assert response.content == b"regex"
+        response = await client.get("http://test_url/users/1?a=1&b=2")
+        assert response.content == b"template"
+        response = await client.get("http://test_url/other?a=1+2")
+        assert response.content == b"any URL"
+
+    assert len(httpx_mock.get_requests(match_params={"b": "2", "a": "1"})) == 1
+
+
+@pytest.mark.asyncio
+async def test_url_query_matching_whatever_the_order(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url?b=2&a=1", match_params={})
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url?a=1&b=2")
+        assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_params_not_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url?b=2", match_params={"a": "1"})
+
+    async with httpx.AsyncClient() as client:
+        with pytest.raises(httpx.HTTPError) as exception_info:
+            await client.get("http://test_url?a=1&b=2&c=3")
+        assert (
+            str(exception_info.value)
+            == """No mock can be found for GET request on http://test_url?a=1&b=2&c=3.
+Closest registrations (1 out of 1):
+ * <Response [200 OK]> on any method on http://test_url with params a=1&b=2
+   - params: expected 'a=1&b=2' but received 'a=1&b=2&c=3'"""
+        )
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+@pytest.mark.asyncio
+async def test_json_matching_equal_numbers(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(match_json={"a": 1, "b": [2.0, 0.5], "c": -0.0})
+
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            "http://test_url", data=b'{"c": 0, "b": [2, 5e-1], "a": 1.0}'
+        )
+        assert response.status_code == 200
+        response = await client.post(
+            "http://test_url", data=b'{"c": 0.0, "b": [2e0, 0.50], "a": 10e-1}'
+        )
+        assert response.status_code == 200
+        with pytest.raises(httpx.HTTPError):
+            await client.post(
+                "http://test_url", data=b'{"c": 0, "b": [2, 0.5], "a": 1.1}'
+            )
+
+
+@pytest.mark.asyncio
+async def test_requests_retrieval_on_url_and_params(httpx_mock: HTTPXMock):
+    httpx_mock.add_response()
+
+    async with httpx.AsyncClient() as client:
+        await client.get("http://test_url/path?b=2&a=1")
+        await client.post("http://test_url/path?a=1&b=2")
+        await client.get("http://test_url/path?a=1")
+        await client.get("http://test_url/other?a=1&b=2")
+
+    requests = httpx_mock.get_requests(
+        url="http://test_url/path", match_params={"a": "1", "b": "2"}
+    )
+    assert [request.method for request in requests] == ["GET", "POST"]
+    request = httpx_mock.get_request(
+        url="http://test_url/path?b=2", method="POST", match_params={"a": "1"}
+    )
+    assert request.url == "http://test_url/path?a=1&b=2"
+    assert (
+        httpx_mock.get_request(url="http://test_url/path?a=1", match_params={}).url
+        == "http://test_url/path?a=1"
+    )
+
+
+@pytest.mark.asyncio
+async def test_headers_matching_none_value(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(match_headers={"X-Absent": None}, data=b"matched")
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://test_url")
+        assert response.content == b"matched"
+
+        with pytest.raises(httpx.HTTPError) as exception_info:
+            await client.get("http://test_url", headers={"X-Absent": "1"})
+        assert "   - header x-absent: expected not to be sent but received '1'" in str(
+            exception_info.value
+        )
+
+
+@pytest.mark.asyncio
+async def test_iterator_response(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(data=iter([b"part 1", b"part 2"]))
+
+    async with httpx.AsyncClient() as client:
+        for _ in range(2):
+            response = await client.get("http://test_url")
+            assert response.content == b"part 1part 2"
@@ -1,4 +1,8 @@
+import json
 import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import pytest
@@ -40,6 +44,20 @@ def test_url_matching(httpx_mock: HTTPXMock):
         assert response.content == b""
 
 
+def test_url_normalization(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="HTTP://TEST_URL/a/../b c?d=é", data=b"normalized")
+    httpx_mock.add_response(
+        url="http://test_url/b%20c?d=%C3%A9", data=b"already normalized"
+    )
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url/b c?d=é")
+        assert response.content == b"normalized"
+
+        response = client.get("http://Test_Url/a/../b%20c?d=%C3%A9")
+        assert response.content == b"already normalized"
+
+
 def test_method_matching(httpx_mock: HTTPXMock):
     httpx_mock.add_response(method="get")
 
@@ -663,7 +681,11 @@ def test_headers_not_matching(httpx_mock: HTTPXMock):
             client.get("http://test_url")
         assert (
             str(exception_info.value)
-            == "No mock can be found for GET request on http://test_url."
+            == """No mock can be found for GET request on http://test_url.
+Closest registrations (1 out of 1):
+ * <Response [200 OK]> on any method on any URL with headers {'user-agent': 'python-httpx/0.11.1', 'host': 'test_url2', 'host2': 'test_url'}
+   - header host: expected 'test_url2' but received 'test_url'
+   - header host2: expected 'test_url' but received nothing"""
         )
 
     # Clean up responses to avoid assertion failure
@@ -686,8 +708,850 @@ def test_content_not_matching(httpx_mock: HTTPXMock):
             client.post("http://test_url", data=b"This is the body2")
         assert (
             str(exception_info.value)
-            == "No mock can be found for POST request on http://test_url."
+            == """No mock can be found for POST request on http://test_url.
+Closest registrations (1 out of 1):
+ * <Response [200 OK]> on any method on any URL with content
+   - content: expected b'This is the body' but received b'This is the body2'"""
+        )
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+def test_response_selection_order_with_exact_and_pattern_urls(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url=re.compile(".*test.*"), data=b"test content 1")
+    httpx_mock.add_response(url="http://test_url", data=b"test content 2")
+    httpx_mock.add_response(method="GET", data=b"test content 3")
+    httpx_mock.add_response(
+        url=httpx.URL("http://test_url"), method="GET", data=b"test content 4"
+    )
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url")
+        assert response.content == b"test content 1"
+
+        response = client.get("http://test_url")
+        assert response.content == b"test content 2"
+
+        response = client.get("http://test_url")
+        assert response.content == b"test content 3"
+
+        response = client.get("http://test_url")
+        assert response.content == b"test content 4"
+
+        response = client.get("http://test_url")
+        assert response.content == b"test content 4"
+
+        response = client.post("http://test_url")
+        assert response.content == b"test content 2"
+
+
+def test_with_many_exact_urls(httpx_mock: HTTPXMock):
+    for index in range(1000):
+        httpx_mock.add_response(
+            url=f"http://test_url/{index}", data=f"test content {index}".encode()
+        )
+
+    with httpx.Client() as client:
+        for index in range(1000):
+            response = client.get(f"http://test_url/{index}")
+            assert response.content == f"test content {index}".encode()
+
+
+def test_with_many_patterns_in_url(httpx_mock: HTTPXMock):
+    for index in range(100):
+        httpx_mock.add_response(
+            url=re.compile(f"http://test_url/{index}$"),
+            data=f"test content {index}".encode(),
+        )
+    httpx_mock.add_response(url=re.compile(".*/1.*"), data=b"test content fallback")
+
+    with httpx.Client() as client:
+        for index in range(100):
+            response = client.get(f"http://test_url/{index}")
+            assert response.content == f"test content {index}".encode()
+
+        response = client.get("http://test_url/1")
+        assert response.content == b"test content fallback"
+
+        response = client.get("http://test_url/1")
+        assert response.content == b"test content fallback"
+
+
+def test_patterns_in_url_with_flags_and_groups(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url=re.compile("HTTP://TEST_URL/(a+)", re.IGNORECASE), data=b"test content 1"
+    )
+    httpx_mock.add_response(
+        url=re.compile(r"http://test_url/(b)\1"), data=b"test content 2"
+    )
+    httpx_mock.add_response(
+        url=re.compile("http://test_url/(?P<name>c)"), data=b"test content 3"
+    )
+    httpx_mock.add_response(
+        url=re.compile("(?i)HTTP://TEST_URL/D"), data=b"test content 4"
+    )
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url/aa")
+        assert response.content == b"test content 1"
+
+        response = client.get("http://test_url/bb")
+        assert response.content == b"test content 2"
+
+        response = client.get("http://test_url/c")
+        assert response.content == b"test content 3"
+
+        response = client.get("http://test_url/d")
+        assert response.content == b"test content 4"
+
+        with pytest.raises(httpx.HTTPError):
+            client.get("http://test_url/b")
+
+
+def test_headers_matching_is_case_insensitive(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        match_headers={"User-Agent": "python-httpx/0.11.1", "X-TEST": "1, 2"}
+    )
+
+    with httpx.Client() as client:
+        response = client.get(
+            "http://test_url", headers=[("x-test", "1"), ("X-Test", "2")]
+        )
+        assert response.content == b""
+
+
+def test_headers_matching_multiple_values(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(match_headers={"X-Test": ["1", "2"]}, data=b"list")
+    httpx_mock.add_response(match_headers={"X-Test": "1, 2"}, data=b"joined")
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url", headers={"X-Test": "1, 2"})
+        assert response.content == b"joined"
+        # Client would merge repeated headers into a single one
+        response = client.send(
+            httpx.Request(
+                "GET", "http://test_url", headers=[("X-Test", "1"), ("X-Test", "2")]
+            )
+        )
+        assert response.content == b"list"
+        # Order of values matters
+        with pytest.raises(httpx.HTTPError):
+            client.send(
+                httpx.Request(
+                    "GET", "http://test_url", headers=[("X-Test", "2"), ("X-Test", "1")]
+                )
+            )
+
+
+def test_headers_matching_regex(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(match_headers={"Authorization": re.compile(r"Bearer \w+$")})
+
+    with httpx.Client() as client:
+        response = client.get(
+            "http://test_url", headers={"Authorization": "Bearer token"}
+        )
+        assert response.content == b""
+
+        with pytest.raises(httpx.HTTPError):
+            client.get("http://test_url", headers={"Authorization": "Basic token"})
+        with pytest.raises(httpx.HTTPError):
+            client.get("http://test_url")
+
+
+def test_headers_matching_presence(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        match_headers={"X-Present": True, "X-Absent": False}, data=b"matched"
+    )
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url", headers={"X-Present": ""})
+        assert response.content == b"matched"
+
+        with pytest.raises(httpx.HTTPError):
+            client.get("http://test_url")
+        with pytest.raises(httpx.HTTPError):
+            client.get("http://test_url", headers={"X-Present": "1", "X-Absent": "1"})
+
+    assert len(httpx_mock.get_requests(match_headers={"x-absent": True})) == 1
+    assert len(httpx_mock.get_requests(match_headers={"x-present": True})) == 2
+
+
+def test_json_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="http://test_url", match_json={"a": 1, "b": [1, {"c": None}]}
+    )
+
+    with httpx.Client() as client:
+        response = client.post("http://test_url", json={"b": [1, {"c": None}], "a": 1})
+        assert response.content == b""
+        response = client.post(
+            "http://test_url", data=b'{ "b" : [1,{"c":null}],\n "a": 1 }'
+        )
+        assert response.content == b""
+
+        with pytest.raises(httpx.HTTPError):
+            client.post("http://test_url", json={"a": 1, "b": [{"c": None}, 1]})
+        with pytest.raises(httpx.HTTPError):
+            client.post("http://test_url", data=b"not json")
+        with pytest.raises(httpx.HTTPError):
+            client.post("http://test_url/other", json={"a": 1, "b": [1, {"c": None}]})
+
+    assert len(httpx_mock.get_requests(match_json={"a": 1, "b": [1, {"c": None}]})) == 3
+
+
+def test_json_matching_amongst_many(httpx_mock: HTTPXMock):
+    for index in range(1_000):
+        httpx_mock.add_response(
+            url="http://test_url",
+            method="POST",
+            match_json={"index": index},
+            data=f"exact {index}".encode(),
+        )
+    httpx_mock.add_response(
+        url=re.compile("http://test_url/.*"),
+        match_json={"index": 0},
+        data=b"regex",
+    )
+    httpx_mock.add_response(match_json={"index": 1}, data=b"any url")
+
+    with httpx.Client() as client:
+        for index in reversed(range(1_000)):
+            response = client.post("http://test_url", json={"index": index})
+            assert response.content == f"exact {index}".encode()
+        response = client.post("http://test_url/path", json={"index": 0})
+        assert response.content == b"regex"
+        response = client.post("http://other_url", json={"index": 1})
+        assert response.content == b"any url"
+
+
+def test_content_matching_on_streamed_body(httpx_mock: HTTPXMock):
+    for index in range(10):
+        httpx_mock.add_response(
+            match_content=f"body {index}".encode(), data=f"content {index}".encode()
+        )
+
+    with httpx.Client() as client:
+        response = client.post("http://test_url", data=iter([b"body ", b"9"]))
+        assert response.content == b"content 9"
+
+    assert httpx_mock.get_request(match_content=b"body 9").read() == b"body 9"
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+def test_async_callback_with_sync_client(httpx_mock: HTTPXMock):
+    async def custom_response(request: httpx.Request, *args, **kwargs):
+        return httpx.Response(
+            status_code=200, http_version="HTTP/1.1", content=b"", request=request
+        )
+
+    httpx_mock.add_callback(custom_response)
+
+    with httpx.Client() as client:
+        with pytest.raises(httpx.HTTPError) as exception_info:
+            client.get("http://test_url")
+        assert str(exception_info.value).startswith("Asynchronous callback <function ")
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(switch_interval)
+
+
+def test_responses_sent_from_many_threads(
+    httpx_mock: HTTPXMock, frequent_thread_switches
+):
+    nb_requests = 640
+    for index in range(nb_requests):
+        httpx_mock.add_response(url="http://test_url", data=str(index).encode())
+
+    with httpx.Client() as client:
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            contents = list(
+                executor.map(
+                    lambda _: client.get("http://test_url").content, range(nb_requests)
+                )
+            )
+
+    # Every response must have been sent exactly once
+    assert sorted(contents) == sorted(
+        str(index).encode() for index in range(nb_requests)
+    )
+    assert len(httpx_mock.get_requests()) == nb_requests
+
+
+def test_callbacks_executed_from_many_threads(
+    httpx_mock: HTTPXMock, frequent_thread_switches
+):
+    nb_calls = []
+
+    def custom_response(request: httpx.Request, *args, **kwargs) -> httpx.Response:
+        nb_calls.append(request)
+        return httpx.Response(
+            status_code=200, http_version="HTTP/1.1", content=b"", request=request
+        )
+
+    httpx_mock.add_callback(custom_response, url=re.compile(".*test_url.*"))
+
+    with httpx.Client() as client:
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            list(
+                executor.map(
+                    lambda index: client.get(f"http://test_url/{index % 8}"),
+                    range(3200),
+                )
+            )
+
+    assert len(nb_calls) == 3200
+    [(matcher, callback)] = list(httpx_mock._callbacks)
+    assert matcher.nb_calls == 3200
+    for index in range(8):
+        assert len(httpx_mock.get_requests(url=f"http://test_url/{index}")) == 400
+
+
+def test_response_streamed_many_times(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url", data=b"test content")
+
+    with httpx.Client() as client:
+        with client.stream("GET", "http://test_url") as response1:
+            assert b"".join(response1.iter_bytes()) == b"test content"
+
+        with client.stream("GET", "http://test_url") as response2:
+            assert b"".join(response2.iter_bytes()) == b"test content"
+
+    assert response1 is not response2
+    assert response1.request is not response2.request
+
+
+def test_iterator_response_sent_many_times(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="http://test_url", data=iter([b"test content 1", b"test content 2"])
+    )
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url")
+        assert response.content == b"test content 1test content 2"
+
+        response = client.get("http://test_url")
+        assert response.content == b"test content 1test content 2"
+
+
+def test_file_response(httpx_mock: HTTPXMock, tmp_path):
+    file_path = tmp_path / "body.bin"
+    file_path.write_bytes(b"0123456789" * 1000)
+    httpx_mock.add_response(url="http://test_url", file=file_path, chunk_size=1000)
+    httpx_mock.add_response(url="http://test_url2", file=str(file_path))
+
+    with httpx.Client() as client:
+        with client.stream("GET", "http://test_url") as response:
+            chunks = list(response.iter_raw())
+        assert len(chunks) == 10
+        assert b"".join(chunks) == b"0123456789" * 1000
+
+        response = client.get("http://test_url")
+        assert response.content == b"0123456789" * 1000
+
+        response = client.get("http://test_url2")
+        assert response.content == b"0123456789" * 1000
+
+
+def test_empty_file_response(httpx_mock: HTTPXMock, tmp_path):
+    file_path = tmp_path / "body.bin"
+    file_path.write_bytes(b"")
+    httpx_mock.add_response(url="http://test_url", file=file_path)
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url")
+        assert response.content == b""
+
+
+def test_file_response_with_data(httpx_mock: HTTPXMock, tmp_path):
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.add_response(file=tmp_path / "body.bin", data=b"test content")
+    assert (
+        str(exception_info.value) == "file cannot be provided with data, files or json."
+    )
+
+
+def test_invalid_data_rejected_upon_registration(httpx_mock: HTTPXMock):
+    with pytest.raises(TypeError) as exception_info:
+        httpx_mock.add_response(url="http://test_url", data=1)
+    assert str(exception_info.value) == "Unexpected type for 'data', <class 'int'>"
+
+
+def test_invalid_json_rejected_upon_registration(httpx_mock: HTTPXMock):
+    with pytest.raises(TypeError) as exception_info:
+        httpx_mock.add_response(url="http://test_url", json=object())
+    assert str(exception_info.value) == "Object of type object is not JSON serializable"
+
+
+def test_invalid_json_value_rejected_upon_request(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url", json={"value": object()})
+
+    with httpx.Client() as client:
+        with pytest.raises(TypeError) as exception_info:
+            client.get("http://test_url")
+        assert (
+            str(exception_info.value)
+            == "Object of type object is not JSON serializable"
+        )
+
+
+def test_response_latency(httpx_mock: HTTPXMock):
+    latencies = iter([0.1, 0.3])
+    httpx_mock.add_response(url="http://test_url", latency=0.2)
+    httpx_mock.add_response(url="http://test_url2", latency=lambda: next(latencies))
+
+    with httpx.Client() as client:
+        start = time.monotonic()
+        client.get("http://test_url")
+        assert time.monotonic() - start >= 0.2
+
+        start = time.monotonic()
+        client.get("http://test_url2")
+        assert time.monotonic() - start >= 0.1
+
+        start = time.monotonic()
+        client.get("http://test_url2")
+        assert time.monotonic() - start >= 0.3
+
+
+def test_callback_latency(httpx_mock: HTTPXMock):
+    def custom_response(request: httpx.Request, *args, **kwargs) -> httpx.Response:
+        return httpx.Response(
+            status_code=200, http_version="HTTP/1.1", content=b"", request=request
+        )
+
+    httpx_mock.add_callback(custom_response, latency=0.2)
+
+    with httpx.Client() as client:
+        start = time.monotonic()
+        client.get("http://test_url")
+        assert time.monotonic() - start >= 0.2
+
+
+def test_response_bandwidth(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url", data=b"a" * 2000, bandwidth=10_000)
+
+    with httpx.Client() as client:
+        start = time.monotonic()
+        with client.stream("GET", "http://test_url") as response:
+            chunks = list(response.iter_raw())
+        assert time.monotonic() - start >= 0.2
+        assert chunks == [b"a" * 500] * 4
+
+
+def test_requests_retention_last(httpx_mock: HTTPXMock):
+    httpx_mock.retain_requests("last", max_requests=3)
+    httpx_mock.add_response()
+
+    with httpx.Client() as client:
+        for index in range(10):
+            client.get(f"http://test_url/{index}")
+
+    assert [str(request.url) for request in httpx_mock.get_requests()] == [
+        "http://test_url/7",
+        "http://test_url/8",
+        "http://test_url/9",
+    ]
+    assert httpx_mock.get_request(url="http://test_url/6") is None
+    assert httpx_mock.nb_requests == 10
+
+
+def test_requests_retention_metadata(httpx_mock: HTTPXMock):
+    httpx_mock.retain_requests("metadata")
+    httpx_mock.add_response()
+
+    with httpx.Client() as client:
+        client.post("http://test_url", data=b"sent content", headers={"X-Test": "1"})
+
+    request = httpx_mock.get_request(method="POST", url="http://test_url")
+    assert request.headers["x-test"] == "1"
+    assert request.read() == b""
+    assert httpx_mock.get_request(match_content=b"sent content") is None
+    assert httpx_mock.nb_requests == 1
+
+
+def test_requests_retention_none(httpx_mock: HTTPXMock):
+    httpx_mock.retain_requests("none")
+    httpx_mock.add_response()
+
+    with httpx.Client() as client:
+        client.get("http://test_url")
+        client.get("http://test_url")
+
+    assert httpx_mock.get_requests() == []
+    assert httpx_mock.nb_requests == 2
+
+
+def test_requests_retention_change(httpx_mock: HTTPXMock):
+    httpx_mock.add_response()
+
+    with httpx.Client() as client:
+        for index in range(5):
+            client.get(f"http://test_url/{index}")
+
+        httpx_mock.retain_requests("last", max_requests=2)
+        client.get("http://test_url/5")
+
+    assert [str(request.url) for request in httpx_mock.get_requests()] == [
+        "http://test_url/4",
+        "http://test_url/5",
+    ]
+    assert httpx_mock.nb_requests == 6
+
+
+def test_invalid_requests_retention(httpx_mock: HTTPXMock):
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.retain_requests("first")
+    assert (
+        str(exception_info.value)
+        == "first is not a valid retention policy. Valid policies are all, last, metadata, none."
+    )
+
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.retain_requests("last")
+    assert (
+        str(exception_info.value)
+        == "max_requests must be provided if (and only if) retention policy is last."
+    )
+
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.retain_requests("last", max_requests=-1)
+    assert (
+        str(exception_info.value)
+        == "max_requests must be a positive number (or 0), -1 was provided."
+    )
+
+    # Previous retention policy is kept
+    httpx_mock.add_response()
+    with httpx.Client() as client:
+        client.get("http://test_url")
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_requests_retrieval_amongst_many(httpx_mock: HTTPXMock):
+    httpx_mock.add_response()
+
+    with httpx.Client() as client:
+        for index in range(2000):
+            if index % 2:
+                client.get(
+                    f"http://test_url/{index % 20}", headers={"X-Index": str(index)}
+                )
+            else:
+                client.post(
+                    f"http://test_url/{index % 20}", headers={"X-Index": str(index)}
+                )
+
+    assert len(httpx_mock.get_requests(url="http://test_url/3")) == 100
+    assert len(httpx_mock.get_requests(url="http://test_url/3", method="POST")) == 0
+    assert len(httpx_mock.get_requests(method="post")) == 1000
+    assert len(httpx_mock.get_requests(url=re.compile(".*/1.*"))) == 1100
+    request = httpx_mock.get_request(
+        url="http://test_url/4", match_headers={"X-Index": "1984"}
+    )
+    assert request.method == "POST"
+    assert len(httpx_mock.get_requests()) == 2000
+
+
+def test_requests_retrieval_with_retention_last(httpx_mock: HTTPXMock):
+    httpx_mock.retain_requests("last", max_requests=5)
+    httpx_mock.add_response()
+
+    with httpx.Client() as client:
+        for index in range(20):
+            client.get(f"http://test_url/{index % 3}")
+
+    assert [str(request.url) for request in httpx_mock.get_requests(method="GET")] == [
+        "http://test_url/0",
+        "http://test_url/1",
+        "http://test_url/2",
+        "http://test_url/0",
+        "http://test_url/1",
+    ]
+    assert len(httpx_mock.get_requests(url="http://test_url/1")) == 2
+    assert len(httpx_mock.get_requests(url="http://test_url/2")) == 1
+
+
+def test_closest_registrations_reported(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url", method="PUT")
+    httpx_mock.add_response(url="http://test_url2", match_headers={"X-Test": True})
+    httpx_mock.add_response(url="http://test_url", match_json={"a": 1})
+    httpx_mock.add_response(url=re.compile(".*other.*"), method="PUT")
+
+    with httpx.Client() as client:
+        with pytest.raises(httpx.HTTPError) as exception_info:
+            client.post("http://test_url", json={"a": 2})
+        assert (
+            str(exception_info.value)
+            == """No mock can be found for POST request on http://test_url.
+Closest registrations (3 out of 4):
+ * <Response [200 OK]> on PUT on http://test_url
+   - method: expected PUT but received POST
+ * <Response [200 OK]> on any method on http://test_url with JSON {"a":1}
+   - JSON: expected '{"a":1}' but received '{"a":2}'
+ * <Response [200 OK]> on any method on http://test_url2 with headers {'X-Test': True}
+   - URL: expected http://test_url2 but received http://test_url
+   - header x-test: expected to be sent"""
+        )
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+def test_add_responses(httpx_mock: HTTPXMock):
+    httpx_mock.add_responses(
+        {"url": f"http://test_url/{index}", "json": {"index": index}}
+        for index in range(1_000)
+    )
+    httpx_mock.add_responses(
+        [{"url": "http://test_url/0", "method": "POST", "status_code": 201}]
+    )
+
+    with httpx.Client() as client:
+        for index in range(1_000):
+            response = client.get(f"http://test_url/{index}")
+            assert response.json() == {"index": index}
+        response = client.post("http://test_url/0")
+        assert response.status_code == 201
+
+
+def test_add_responses_body_encoded_upon_first_request(httpx_mock: HTTPXMock):
+    httpx_mock.add_responses(
+        [
+            {"url": "http://test_url", "json": {"key": "value"}},
+            {"url": "http://test_url2", "data": "not requested"},
+        ]
+    )
+    (_, requested), (_, not_requested) = httpx_mock._responses
+    assert requested._body is None
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url")
+        assert response.json() == {"key": "value"}
+        response = client.get("http://test_url")
+        assert response.json() == {"key": "value"}
+
+    assert requested._body == b'{"key": "value"}'
+    assert not_requested._body is None
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+def test_url_template_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url_template="http://test_url/users/{user_id}/orders/{order_id}",
+        data=b"order",
+    )
+    httpx_mock.add_response(
+        url_template="http://test_url/users/{user_id}", data=b"user"
+    )
+    httpx_mock.add_response(url_template="http://test_url/users/me", data=b"me")
+    httpx_mock.add_response(
+        url_template="http://test_url/users/{user_id}?page=2", data=b"page 2"
+    )
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url/users/1/orders/a%20b")
+        assert response.content == b"order"
+        response = client.get("http://test_url/users/2")
+        assert response.content == b"user"
+        # Both URL templates match, the first one (user) was already sent
+        response = client.get("http://test_url/users/me")
+        assert response.content == b"me"
+        response = client.get("http://test_url/users/3?page=2")
+        assert response.content == b"page 2"
+
+    assert len(httpx_mock.get_requests(url_template="http://test_url/users/{id}")) == 2
+
+
+def test_url_template_not_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url_template="http://test_url/users/{user_id}")
+
+    with httpx.Client() as client:
+        for url in (
+            "http://test_url/users",
+            "http://test_url/users/",
+            "http://test_url/users/1/orders",
+            "http://test_url/users/1?page=2",
+            "http://test_url2/users/1",
+            "https://test_url/users/1",
+        ):
+            with pytest.raises(httpx.HTTPError) as exception_info:
+                client.get(url)
+            assert str(exception_info.value).startswith(
+                f"No mock can be found for GET request on {url}.\n"
+            )
+            assert (
+                f"   - URL: {url} does not match http://test_url/users/{{user_id}}"
+                in str(exception_info.value)
+            )
+
+    # Clean up responses to avoid assertion failure
+    httpx_mock._responses.clear()
+
+
+def test_url_template_callback(httpx_mock: HTTPXMock):
+    def custom_response(request: httpx.Request, timeout, url_params):
+        return httpx.Response(
+            200, content=json.dumps(url_params).encode(), request=request
+        )
+
+    httpx_mock.add_callback(
+        custom_response,
+        url_template="http://test_url/users/{user_id}/orders/{order_id}",
+        method="GET",
+    )
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url/users/1/orders/a%2Fb")
+        assert response.json() == {"user_id": "1", "order_id": "a/b"}
+
+
+@pytest.mark.parametrize(
+    "url_template, message",
+    [
+        ("/users/{user_id}", "/users/{user_id} is not a valid URL template."),
+        (
+            "http://test_url/users/user_{user_id}",
+            "http://test_url/users/user_{user_id} is not a valid URL template, parameters must be full path segments such as {name}.",
+        ),
+        (
+            "http://test_url/{id}/{id}",
+            "http://test_url/{id}/{id} is not a valid URL template, id parameter is provided more than once.",
+        ),
+    ],
+)
+def test_invalid_url_template(httpx_mock: HTTPXMock, url_template, message):
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.add_response(url_template=url_template)
+    assert str(exception_info.value) == message
+
+
+def test_url_and_url_template(httpx_mock: HTTPXMock):
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.add_response(
+            url="http://test_url", url_template="http://test_url/{id}"
+        )
+    assert (
+        str(exception_info.value) == "url and url_template cannot be provided together."
+    )
+
+
+def test_params_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="http://test_url/path?b=2",
+        match_params={"a": "1", "c": ["3", "4"]},
+        data=b"exact URL",
+    )
+    httpx_mock.add_response(
+        url=re.compile(".*/regex.*"), match_params={"a": "1"}, data=b"regex"
+    )
+    httpx_mock.add_response(
+        url_template="http://test_url/users/{user_id}?b=2",
+        match_params={"a": "1"},
+        data=b"template",
+    )
+    httpx_mock.add_response(match_params={"a": "1 2"}, data=b"any URL")
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url/path?c=4&a=1&b=2&c=3")
+        assert response.content == b"exact URL"
+        response = client.get(
+            "http://test_url/path", params={"a": 1, "b": 2, "c": [3, 4]}
+        )
+        assert response.content == b"exact URL"
+        response = client.get("http://test_url/regex?a=1")
+        assert response.content == b"regex"
+        response = client.get("http://test_url/users/1?a=1&b=2")
+        assert response.content == b"template"
+        response = client.get("http://test_url/other?a=1+2")
+        assert response.content == b"any URL"
+
+    assert len(httpx_mock.get_requests(match_params={"b": "2", "a": "1"})) == 1
+
+
+def test_url_query_matching_whatever_the_order(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url?b=2&a=1", match_params={})
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url?a=1&b=2")
+        assert response.status_code == 200
+
+
+def test_params_not_matching(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://test_url?b=2", match_params={"a": "1"})
+
+    with httpx.Client() as client:
+        with pytest.raises(httpx.HTTPError) as exception_info:
+            client.get("http://test_url?a=1&b=2&c=3")
+        assert (
+            str(exception_info.value)
+            == """No mock can be found for GET request on http://test_url?a=1&b=2&c=3.
+Closest registrations (1 out of 1):
+ * <Response [200 OK]> on any method on http://test_url with params a=1&b=2
+   - params: expected 'a=1&b=2' but received 'a=1&b=2&c=3'"""
         )
 
     # Clean up responses to avoid assertion failure
     httpx_mock._responses.clear()
+
+
+def test_json_matching_equal_numbers(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(match_json={"a": 1, "b": [2.0, 0.5], "c": -0.0})
+
+    with httpx.Client() as client:
+        response = client.post(
+            "http://test_url", data=b'{"c": 0, "b": [2, 5e-1], "a": 1.0}'
+        )
+        assert response.status_code == 200
+        response = client.post(
+            "http://test_url", data=b'{"c": 0.0, "b": [2e0, 0.50], "a": 10e-1}'
+        )
+        assert response.status_code == 200
+        with pytest.raises(httpx.HTTPError):
+            client.post("http://test_url", data=b'{"c": 0, "b": [2, 0.5], "a": 1.1}')
+
+
+def test_requests_retrieval_on_url_and_params(httpx_mock: HTTPXMock):
+    httpx_mock.add_response()
+
+    with httpx.Client() as client:
+        client.get("http://test_url/path?b=2&a=1")
+        client.post("http://test_url/path?a=1&b=2")
+        client.get("http://test_url/path?a=1")
+        client.get("http://test_url/other?a=1&b=2")
+
+    requests = httpx_mock.get_requests(
+        url="http://test_url/path", match_params={"a": "1", "b": "2"}
+    )
+    assert [request.method for request in requests] == ["GET", "POST"]
+    request = httpx_mock.get_request(
+        url="http://test_url/path?b=2", method="POST", match_params={"a": "1"}
+    )
+    assert request.url == "http://test_url/path?a=1&b=2"
+    assert (
+        httpx_mock.get_request(url="http://test_url/path?a=1", match_params={}).url
+        == "http://test_url/path?a=1"
+    )
+
+
+def test_headers_matching_none_value(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(match_headers={"X-Absent": None}, data=b"matched")
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url")
+        assert response.content == b"matched"
+
+        with pytest.raises(httpx.HTTPError) as exception_info:
+            client.get("http://test_url", headers={"X-Absent": "1"})
+        assert "   - header x-absent: expected not to be sent but received '1'" in str(
+            exception_info.value
+        )
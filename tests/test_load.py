@@ -0,0 +1,87 @@
+import re
+import threading
+
+import pytest
+import httpx
+
+from pytest_httpx import httpx_mock, HTTPXMock, httpx_load, LoadHarness
+
+
+def test_threads_load(httpx_mock: HTTPXMock, httpx_load: LoadHarness):
+    httpx_mock.add_response(url="http://test_url", data=b"content")
+    client = httpx.Client()
+    threads = set()
+
+    def call(index: int):
+        threads.add(threading.get_ident())
+        assert client.get("http://test_url").content == b"content"
+
+    report = httpx_load.run_threads(call, calls=200, concurrency=4)
+    client.close()
+
+    assert report.calls == 200
+    assert report.requests == 200
+    assert len(threads) > 1
+    assert 1 <= report.max_in_flight <= 4
+    assert report.throughput > 0
+    assert 0 < report.latency_p50 <= report.latency_p99 <= report.latency_max
+    assert report.mock_time > 0
+    assert report.mock_overhead > 0
+    assert report.client_overhead > 0
+    assert not report.errors
+    assert httpx_mock.nb_requests == 200
+
+
+@pytest.mark.asyncio
+async def test_tasks_load(httpx_mock: HTTPXMock, httpx_load: LoadHarness):
+    httpx_mock.add_response(url=re.compile("http://test_url.*"), latency=0.01)
+
+    async with httpx.AsyncClient() as client:
+
+        async def call(index: int):
+            await client.get("http://test_url", params={"index": index})
+            await client.get("http://test_url")
+
+        report = await httpx_load.run_tasks(call, calls=50, concurrency=10)
+
+    assert report.calls == 50
+    assert report.requests == 100
+    # Every task is waiting for the mock latency at the same time
+    assert report.max_in_flight == 10
+    assert report.latency_p50 >= 0.02
+    # Latency is simulated by the mock
+    assert report.mock_overhead >= 0.01
+    assert report.mock_time <= report.latency_p50 * 50 * 2
+    assert len(httpx_mock.get_requests(url="http://test_url?index=49")) == 1
+
+
+def test_load_errors(httpx_mock: HTTPXMock, httpx_load: LoadHarness):
+    httpx_mock.add_response(url="http://test_url")
+
+    def call(index: int):
+        with httpx.Client() as client:
+            client.get("http://test_url" if index % 2 else "http://other_url")
+
+    report = httpx_load.run_threads(call, calls=10, concurrency=2)
+
+    assert report.calls == 10
+    assert report.requests == 10
+    assert len(report.errors) == 5
+    assert all(isinstance(error, httpx.HTTPError) for error in report.errors)
+
+
+def test_mock_not_measured_outside_of_load(
+    httpx_mock: HTTPXMock, httpx_load: LoadHarness
+):
+    httpx_mock.add_response()
+
+    def call(index: int):
+        with httpx.Client() as client:
+            client.get("http://test_url")
+
+    report = httpx_load.run_threads(call, calls=1)
+    call(1)
+
+    assert report.requests == 1
+    assert "_handle_request" not in vars(httpx_mock)
+    assert str(report).startswith("1 calls in ")
@@ -0,0 +1,77 @@
+import httpx
+from httpx.dispatch.connection_pool import ConnectionPool
+from httpx.dispatch.urllib3 import URLLib3Dispatcher
+
+from pytest_httpx import httpx_mock, HTTPXMock
+from pytest_httpx._httpx_mock import _PytestSyncDispatcher, _PytestAsyncDispatcher
+
+
+def test_clients_not_mocked_without_fixture():
+    url = httpx.URL("http://test_url")
+    assert isinstance(httpx.Client().dispatcher_for_url(url), URLLib3Dispatcher)
+    assert isinstance(httpx.AsyncClient().dispatcher_for_url(url), ConnectionPool)
+
+
+def test_clients_mocked_with_fixture(httpx_mock: HTTPXMock):
+    url = httpx.URL("http://test_url")
+    sync_dispatcher = httpx.Client().dispatcher_for_url(url)
+    assert isinstance(sync_dispatcher, _PytestSyncDispatcher)
+    assert sync_dispatcher.mock is httpx_mock
+    async_dispatcher = httpx.AsyncClient().dispatcher_for_url(url)
+    assert isinstance(async_dispatcher, _PytestAsyncDispatcher)
+    assert async_dispatcher.mock is httpx_mock
+
+
+def test_dispatchers_reused(httpx_mock: HTTPXMock):
+    url = httpx.URL("http://test_url")
+    sync_dispatcher = httpx.Client().dispatcher_for_url(url)
+    assert httpx.Client().dispatcher_for_url(url) is sync_dispatcher
+    async_dispatcher = httpx.AsyncClient().dispatcher_for_url(url)
+    assert httpx.AsyncClient().dispatcher_for_url(url) is async_dispatcher
+
+
+def test_clients_patched_once_per_session(testdir):
+    testdir.makepyfile("""
+import httpx
+import pytest
+from pytest_httpx import httpx_mock, HTTPXMock
+
+patched = []
+
+
+@pytest.mark.parametrize("index", range(3))
+def test_mocked(httpx_mock: HTTPXMock, index):
+    patched.append(httpx.Client.dispatcher_for_url)
+    httpx_mock.add_response()
+
+    with httpx.Client() as client:
+        client.get("http://test_url")
+
+
+def test_patched_once():
+    assert patched[0] is patched[1] is patched[2]
+""")
+    original = httpx.Client.dispatcher_for_url
+    result = testdir.runpytest("-p", "pytest_httpx")
+    result.assert_outcomes(passed=4)
+    # Patch is reverted at the end of the session
+    assert httpx.Client.dispatcher_for_url is original
+
+
+def test_mock_deactivated_after_failing_test(testdir):
+    testdir.makepyfile("""
+import httpx
+from httpx.dispatch.urllib3 import URLLib3Dispatcher
+from pytest_httpx import httpx_mock, HTTPXMock
+
+
+def test_response_not_requested(httpx_mock: HTTPXMock):
+    httpx_mock.add_response()
+
+
+def test_not_mocked():
+    dispatcher = httpx.Client().dispatcher_for_url(httpx.URL("http://test_url"))
+    assert isinstance(dispatcher, URLLib3Dispatcher)
+""")
+    result = testdir.runpytest("-p", "pytest_httpx")
+    result.assert_outcomes(passed=2, errors=1)
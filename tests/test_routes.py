@@ -0,0 +1,124 @@
+import json
+
+import pytest
+import httpx
+
+from pytest_httpx import httpx_mock, HTTPXMock
+
+
+def test_json_route_table(httpx_mock: HTTPXMock, tmp_path):
+    table = tmp_path / "routes.json"
+    table.write_text(
+        json.dumps(
+            [
+                {"url": "http://test_url/users", "json": [{"id": 1}]},
+                {
+                    "url": "http://test_url/users",
+                    "method": "POST",
+                    "match_json": {"name": "test"},
+                    "status_code": 201,
+                    "headers": {"Location": "http://test_url/users/2"},
+                },
+                {
+                    "url": "http://test_url/ping",
+                    "method": "PUT",
+                    "match_content": "ping",
+                    "data": "pong",
+                },
+            ]
+        )
+    )
+    httpx_mock.load_responses(table)
+
+    with httpx.Client() as client:
+        assert client.get("http://test_url/users").json() == [{"id": 1}]
+        response = client.post("http://test_url/users", json={"name": "test"})
+        assert response.status_code == 201
+        assert response.headers["location"] == "http://test_url/users/2"
+        assert client.put("http://test_url/ping", data=b"ping").text == "pong"
+
+
+def test_yaml_route_table(httpx_mock: HTTPXMock, tmp_path):
+    pytest.importorskip("yaml")
+    table = tmp_path / "routes.yaml"
+    table.write_text("""
+- url: http://test_url/users
+  json:
+    - id: 1
+- url: http://test_url/users
+  method: DELETE
+  status_code: 204
+  match_headers:
+    Authorization: true
+""")
+    httpx_mock.load_responses(table)
+
+    with httpx.Client() as client:
+        assert client.get("http://test_url/users").json() == [{"id": 1}]
+        response = client.delete(
+            "http://test_url/users", headers={"Authorization": "Bearer 1"}
+        )
+        assert response.status_code == 204
+
+
+def test_csv_route_table(httpx_mock: HTTPXMock, tmp_path):
+    table = tmp_path / "routes.csv"
+    table.write_text(
+        "method,url,status_code,headers,data,json,match_json\n"
+        'GET,http://test_url/users,,"{""X-Test"": ""1""}",,"[{""id"": 1}]",\n'
+        'POST,http://test_url/users,201,,created,,"{""name"": ""test""}"\n'
+    )
+    httpx_mock.load_responses(table)
+
+    with httpx.Client() as client:
+        response = client.get("http://test_url/users")
+        assert response.status_code == 200
+        assert response.headers["x-test"] == "1"
+        assert response.json() == [{"id": 1}]
+        response = client.post("http://test_url/users", json={"name": "test"})
+        assert response.status_code == 201
+        assert response.text == "created"
+
+
+def test_route_table_file_relative_to_table(httpx_mock: HTTPXMock, tmp_path):
+    (tmp_path / "bodies").mkdir()
+    (tmp_path / "bodies" / "users.json").write_bytes(b'[{"id": 1}]')
+    table = tmp_path / "routes.json"
+    table.write_text(
+        json.dumps([{"url": "http://test_url/users", "file": "bodies/users.json"}])
+    )
+    httpx_mock.load_responses(table)
+
+    with httpx.Client() as client:
+        assert client.get("http://test_url/users").json() == [{"id": 1}]
+
+
+@pytest.mark.parametrize(
+    "name, content",
+    [
+        ("routes.json", "not JSON"),
+        ("routes.json", '{"url": "http://test_url"}'),
+        ("routes.json", '["http://test_url"]'),
+        ("routes.csv", "url,status_code\nhttp://test_url,not a status\n"),
+        ("routes.csv", "url\nhttp://test_url,too many cells\n"),
+    ],
+)
+def test_invalid_route_table(httpx_mock: HTTPXMock, tmp_path, name, content):
+    table = tmp_path / name
+    table.write_text(content)
+
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.load_responses(table)
+    assert str(exception_info.value) == f"{table} is not a valid route table."
+
+
+def test_unknown_route_table_format(httpx_mock: HTTPXMock, tmp_path):
+    table = tmp_path / "routes.txt"
+    table.write_text("")
+
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.load_responses(table)
+    assert (
+        str(exception_info.value)
+        == f"{table} is not a JSON (.json), YAML (.yaml, .yml) or CSV (.csv) route table."
+    )
@@ -0,0 +1,278 @@
+import re
+import socket
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+import httpx
+from httpx import content_streams
+
+from pytest_httpx import httpx_mock, HTTPXMock
+
+
+def _send(raw_requests: bytes, url: str) -> bytes:
+    """
+    Send raw requests on a single connection and return everything received until the server closes it.
+    """
+    host, port = url[len("http://") :].split(":")
+    with socket.create_connection((host, int(port))) as connection:
+        connection.sendall(raw_requests)
+        received = []
+        data = connection.recv(65_536)
+        while data:
+            received.append(data)
+            data = connection.recv(65_536)
+        return b"".join(received)
+
+
+def test_response_served(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    assert re.match(r"http://127\.0\.0\.1:\d+$", url)
+    httpx_mock.add_response(
+        url=f"{url}/test", data=b"test content", headers={"X-Test": "1"}
+    )
+
+    with urllib.request.urlopen(f"{url}/test") as response:
+        assert response.status == 200
+        assert response.read() == b"test content"
+        assert response.headers["X-Test"] == "1"
+        assert response.headers["Content-Length"] == "12"
+
+    request = httpx_mock.get_request()
+    assert request.method == "GET"
+    assert request.url == f"{url}/test"
+
+
+def test_response_served_to_another_process(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(url=f"{url}/test", method="POST", status_code=201)
+
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, urllib.request; "
+            f"response = urllib.request.urlopen('{url}/test', data=b'sent'); "
+            "sys.stdout.write(str(response.status))",
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    assert completed.stdout == b"201"
+    assert httpx_mock.get_request(url=f"{url}/test").read() == b"sent"
+
+
+def test_server_used_as_proxy(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(url="http://test_url/path", data=b"test content")
+
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({"http": url}))
+    with opener.open("http://test_url/path") as response:
+        assert response.read() == b"test content"
+
+
+def test_callback_served(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+
+    def custom_response(request: httpx.Request, timeout):
+        return httpx.Response(
+            200,
+            stream=content_streams.IteratorStream(iter([b"part 1", b"part 2"])),
+            request=request,
+        )
+
+    httpx_mock.add_callback(custom_response, match_content=b"expected")
+
+    request = urllib.request.Request(f"{url}/test", data=b"expected", method="PUT")
+    with urllib.request.urlopen(request) as response:
+        assert response.headers["Transfer-Encoding"] == "chunked"
+        assert response.read() == b"part 1part 2"
+
+
+def test_iterator_response_served(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(url=f"{url}/test", data=iter([b"part 1", b"part 2"]))
+
+    for _ in range(2):
+        with urllib.request.urlopen(f"{url}/test") as response:
+            assert response.headers["Transfer-Encoding"] == "chunked"
+            assert response.read() == b"part 1part 2"
+
+
+def test_async_callback_served(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+
+    async def custom_response(request: httpx.Request, timeout):
+        return httpx.Response(200, content=request.url.path.encode(), request=request)
+
+    httpx_mock.add_callback(custom_response)
+
+    with urllib.request.urlopen(f"{url}/test") as response:
+        assert response.read() == b"/test"
+
+
+def test_file_response_served(httpx_mock: HTTPXMock, tmp_path):
+    content = bytes(range(256)) * 4_096
+    file = tmp_path / "content.bin"
+    file.write_bytes(content)
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(url=f"{url}/file", file=file, chunk_size=10_000)
+
+    with urllib.request.urlopen(f"{url}/file") as response:
+        assert response.read() == content
+
+
+def test_without_response(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+
+    with pytest.raises(urllib.error.HTTPError) as exception_info:
+        urllib.request.urlopen(f"{url}/test")
+
+    assert exception_info.value.code == 500
+    assert (
+        exception_info.value.read()
+        == f"No mock can be found for GET request on {url}/test.".encode()
+    )
+
+
+def test_keep_alive_and_pipelining(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(url=f"{url}/first", data=b"first content")
+    httpx_mock.add_response(url=f"{url}/second", method="POST", data=b"second content")
+    httpx_mock.add_response(url=f"{url}/third", method="HEAD")
+
+    received = _send(
+        b"GET /first HTTP/1.1\r\nHost: "
+        + url[len("http://") :].encode()
+        + b"\r\n\r\n"
+        + b"POST /second HTTP/1.1\r\nHost: "
+        + url[len("http://") :].encode()
+        + b"\r\nTransfer-Encoding: chunked\r\n\r\n4\r\nsent\r\n0\r\n\r\n"
+        + b"HEAD /third HTTP/1.1\r\nHost: "
+        + url[len("http://") :].encode()
+        + b"\r\nConnection: close\r\n\r\n",
+        url,
+    )
+
+    responses = received.split(b"HTTP/1.1 ")[1:]
+    assert responses == [
+        b"200 OK\r\nContent-Length: 13\r\n\r\nfirst content",
+        b"200 OK\r\nContent-Length: 14\r\n\r\nsecond content",
+        b"200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n",
+    ]
+    assert httpx_mock.get_request(method="POST").read() == b"sent"
+
+
+def test_bad_request(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+
+    received = _send(b"not HTTP\r\n\r\n", url)
+
+    assert (
+        received
+        == b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+    )
+
+
+def test_server_already_started(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+
+    with pytest.raises(ValueError) as exception_info:
+        httpx_mock.start_server()
+    assert str(exception_info.value) == f"Server is already listening on {url}."
+
+
+def test_server_stopped_on_reset(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    httpx_mock.assert_and_reset()
+
+    with pytest.raises(urllib.error.URLError):
+        urllib.request.urlopen(f"{url}/test", timeout=1)
+
+
+def test_many_requests_on_a_single_connection(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(url=f"{url}/test", data=b"content")
+    host = url[len("http://") :].encode()
+
+    received = _send(
+        (b"GET /test HTTP/1.1\r\nHost: " + host + b"\r\n\r\n") * 999
+        + b"GET /test HTTP/1.1\r\nHost: "
+        + host
+        + b"\r\nConnection: close\r\n\r\n",
+        url,
+    )
+
+    assert received.count(b"HTTP/1.1 200 OK") == 1_000
+    assert httpx_mock.nb_requests == 1_000
+
+
+def test_sent_headers_only(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(
+        url=f"{url}/test", match_headers={"User-Agent": False, "X-Test": ["1", "2"]}
+    )
+    host = url[len("http://") :].encode()
+
+    received = _send(
+        b"POST /test HTTP/1.1\r\nHost: "
+        + host
+        + b"\r\nX-Test: 1\r\nX-Test: 2\r\nTransfer-Encoding: chunked\r\n"
+        + b"Connection: close\r\n\r\n4\r\nsent\r\n0\r\n\r\n",
+        url,
+    )
+
+    assert received.startswith(b"HTTP/1.1 200 OK\r\n")
+    request = httpx_mock.get_request()
+    assert request.headers.raw == [
+        (b"host", host),
+        (b"x-test", b"1"),
+        (b"x-test", b"2"),
+        (b"transfer-encoding", b"chunked"),
+        (b"connection", b"close"),
+    ]
+    assert request.read() == b"sent"
+
+
+def test_sent_headers_only_with_metadata_retention(httpx_mock: HTTPXMock):
+    httpx_mock.retain_requests("metadata")
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(url=f"{url}/test")
+    host = url[len("http://") :].encode()
+
+    _send(
+        b"GET /test HTTP/1.1\r\nHost: " + host + b"\r\nConnection: close\r\n\r\n", url
+    )
+
+    request = httpx_mock.get_request(match_headers={"User-Agent": False})
+    assert request.headers.raw == [(b"host", host), (b"connection", b"close")]
+    assert request.read() == b""
+
+
+def test_expect_100_continue(httpx_mock: HTTPXMock):
+    url = httpx_mock.start_server()
+    httpx_mock.add_response(url=f"{url}/test", method="POST", data=b"uploaded")
+    host, port = url[len("http://") :].split(":")
+
+    with socket.create_connection((host, int(port))) as connection:
+        connection.settimeout(5)
+        connection.sendall(
+            b"POST /test HTTP/1.1\r\nHost: "
+            + f"{host}:{port}".encode()
+            + b"\r\nContent-Length: 4\r\nExpect: 100-continue\r\nConnection: close\r\n\r\n"
+        )
+        # Body is only sent once server agreed to receive it
+        assert connection.recv(65_536) == b"HTTP/1.1 100 Continue\r\n\r\n"
+        connection.sendall(b"sent")
+        received = []
+        data = connection.recv(65_536)
+        while data:
+            received.append(data)
+            data = connection.recv(65_536)
+
+    assert b"".join(received) == (
+        b"HTTP/1.1 200 OK\r\nContent-Length: 8\r\nConnection: close\r\n\r\nuploaded"
+    )
+    assert httpx_mock.get_request().read() == b"sent"
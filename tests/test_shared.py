@@ -0,0 +1,80 @@
+import mmap
+import os
+
+from pytest_httpx._shared import SharedFiles
+
+
+def test_file_mapped_once(tmp_path):
+    file = tmp_path / "content.bin"
+    file.write_bytes(b"content")
+    shared_files = SharedFiles()
+
+    first = shared_files.acquire(file)
+    second = shared_files.acquire(str(file))
+    assert first is second
+    assert first.mapping[:] == b"content"
+    assert first.users == 2
+
+    shared_files.release(first)
+    shared_files.release(second)
+    # Kept mapped once unused
+    assert shared_files.acquire(file) is first
+    shared_files.release(first)
+    shared_files.close()
+    assert first.mapping.closed
+
+
+def test_modified_file_mapped_again(tmp_path):
+    file = tmp_path / "content.bin"
+    file.write_bytes(b"content")
+    shared_files = SharedFiles()
+
+    first = shared_files.acquire(file)
+    file.write_bytes(b"modified content")
+    stat = os.stat(file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second = shared_files.acquire(file)
+
+    assert second is not first
+    assert second.mapping[:] == b"modified content"
+    # Still in use, mapping cannot be closed yet
+    assert not first.mapping.closed
+    shared_files.release(first)
+    assert first.mapping.closed
+    shared_files.release(second)
+    assert not second.mapping.closed
+
+
+def test_empty_file_not_mapped(tmp_path):
+    file = tmp_path / "empty.bin"
+    file.write_bytes(b"")
+    shared_files = SharedFiles()
+
+    shared_file = shared_files.acquire(file)
+    assert shared_file.mapping == b""
+    shared_files.release(shared_file)
+    shared_files.close()
+
+
+def test_least_recently_used_unused_files_closed(tmp_path):
+    shared_files = SharedFiles(max_unused=2)
+    acquired = []
+    for index in range(4):
+        file = tmp_path / f"content_{index}.bin"
+        file.write_bytes(b"content")
+        acquired.append(shared_files.acquire(file))
+
+    in_use = acquired.pop()
+    for shared_file in acquired:
+        shared_files.release(shared_file)
+
+    assert [shared_file.mapping.closed for shared_file in acquired] == [
+        True,
+        False,
+        False,
+    ]
+    assert not in_use.mapping.closed
+    shared_files.close()
+    assert not in_use.mapping.closed
+    shared_files.release(in_use)
+    assert isinstance(in_use.mapping, mmap.mmap)
@@ -0,0 +1,180 @@
+import json
+
+from pytest_httpx._stats import SessionStatistics
+
+_TESTS = """
+import re
+
+import httpx
+import pytest
+from pytest_httpx import httpx_mock, HTTPXMock
+
+
+def _slow_callback(request, timeout):
+    for _ in range(100_000):
+        pass
+    return httpx.Response(200, request=request)
+
+
+@pytest.mark.parametrize("index", range(3))
+def test_responses(httpx_mock: HTTPXMock, index):
+    httpx_mock.add_response(url="http://test_url", method="GET")
+    httpx_mock.add_response(url=re.compile("http://test_url/.*"))
+
+    with httpx.Client() as client:
+        client.get("http://test_url")
+        client.get("http://test_url")
+        client.get("http://test_url/path")
+
+
+def test_callback(httpx_mock: HTTPXMock):
+    httpx_mock.add_callback(_slow_callback, match_headers={"X-Test": "1"})
+
+    with httpx.Client() as client:
+        client.get("http://test_url", headers={"X-Test": "1"})
+
+
+def test_unmatched(httpx_mock: HTTPXMock):
+    with httpx.Client() as client:
+        with pytest.raises(httpx.HTTPError):
+            client.get("http://unmatched_url")
+"""
+
+
+def test_statistics_not_reported_by_default(testdir):
+    testdir.makepyfile(_TESTS)
+    result = testdir.runpytest("-p", "pytest_httpx")
+    result.assert_outcomes(passed=5)
+    assert "httpx mock statistics" not in result.stdout.str()
+
+
+def test_statistics_reported(testdir):
+    testdir.makepyfile(_TESTS)
+    result = testdir.runpytest("-p", "pytest_httpx", "--httpx-stats")
+    result.assert_outcomes(passed=5)
+    result.stdout.fnmatch_lines(
+        [
+            "*= httpx mock statistics =*",
+            "11 requests sent on 3 distinct method and URL, 1 without matching mock.",
+            "*Hits  Evaluations  Matching (s)  Callback (s)  Registration",
+            "       1            1 * callback <function _slow_callback at *> on any method on any URL with headers {'X-Test': '1'} (*test_statistics_reported.py:26)",
+        ]
+    )
+    result.stdout.fnmatch_lines(
+        [
+            "       6            6 *      0.000000  response <Response ?200 OK?> on GET on http://test_url (*test_statistics_reported.py:16)"
+        ]
+    )
+    result.stdout.fnmatch_lines(
+        [
+            "       3            3 *      0.000000  response <Response ?200 OK?> on any method on matching 'http://test_url/.*' (*test_statistics_reported.py:17)"
+        ]
+    )
+
+
+def test_statistics_top(testdir):
+    testdir.makepyfile(_TESTS)
+    result = testdir.runpytest(
+        "-p", "pytest_httpx", "--httpx-stats", "--httpx-stats-top=1"
+    )
+    result.assert_outcomes(passed=5)
+    output = result.stdout.str()
+    assert "_slow_callback" in output
+    assert "<Response [200 OK]>" not in output
+
+
+def test_statistics_without_registration(testdir):
+    testdir.makepyfile("def test_nothing():\n    pass\n")
+    result = testdir.runpytest("-p", "pytest_httpx", "--httpx-stats")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*= httpx mock statistics =*",
+            "0 requests sent on 0 distinct method and URL, 0 without matching mock.",
+            "No httpx_mock registration.",
+        ]
+    )
+
+
+def test_statistics_json_export(testdir):
+    testdir.makepyfile(_TESTS)
+    result = testdir.runpytest("-p", "pytest_httpx", "--httpx-stats-json=stats.json")
+    result.assert_outcomes(passed=5)
+    assert "httpx mock statistics" not in result.stdout.str()
+
+    with open(testdir.tmpdir.join("stats.json")) as export:
+        exported = json.load(export)
+
+    assert sorted(
+        (request["method"], request["url"], request["count"], request["unmatched"])
+        for request in exported["requests"]
+    ) == [
+        ("GET", "http://test_url", 7, 0),
+        ("GET", "http://test_url/path", 3, 0),
+        ("GET", "http://unmatched_url", 1, 1),
+    ]
+    statistics = exported["registrations"]
+
+    assert [
+        (registration["kind"], registration["hits"], registration["evaluations"])
+        for registration in statistics
+    ][0] == ("callback", 1, 1)
+    assert sorted(
+        (registration["kind"], registration["hits"], registration["evaluations"])
+        for registration in statistics[1:]
+    ) == [("response", 3, 3), ("response", 6, 6)]
+    assert statistics[0]["callback_time"] > 0
+    assert statistics[0]["location"].endswith("test_statistics_json_export.py:26")
+
+
+def test_worker_statistics_merged():
+    controller = SessionStatistics()
+    controller.registration("response", "test_a.py:1", "registration").add_hits(1)
+    controller.add_request("GET", "http://test_url")
+
+    worker = SessionStatistics()
+    worker_registration = worker.registration("response", "test_a.py:1", "registration")
+    worker_registration.add_hits(2)
+    worker_registration.add_evaluation(0.5)
+    worker.registration("callback", "test_b.py:1", "registration").add_hits(1)
+    worker.add_request("GET", "http://test_url")
+    worker.add_request("GET", "http://unmatched_url")
+    worker.add_unmatched_request("GET", "http://unmatched_url")
+
+    controller.merge(json.loads(json.dumps(worker.to_json())))
+
+    assert controller.to_json() == {
+        "registrations": [
+            {
+                "kind": "response",
+                "location": "test_a.py:1",
+                "registration": "registration",
+                "hits": 3,
+                "evaluations": 1,
+                "matching_time": 0.5,
+                "callback_time": 0.0,
+            },
+            {
+                "kind": "callback",
+                "location": "test_b.py:1",
+                "registration": "registration",
+                "hits": 1,
+                "evaluations": 0,
+                "matching_time": 0.0,
+                "callback_time": 0.0,
+            },
+        ],
+        "requests": [
+            {"method": "GET", "url": "http://test_url", "count": 2, "unmatched": 0},
+            {
+                "method": "GET",
+                "url": "http://unmatched_url",
+                "count": 1,
+                "unmatched": 1,
+            },
+        ],
+    }
+    assert (
+        controller.requests_summary()
+        == "3 requests sent on 2 distinct method and URL, 1 without matching mock."
+    )